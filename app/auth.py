@@ -1,11 +1,16 @@
+import os
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from werkzeug.security import generate_password_hash, check_password_hash
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from database import SessionLocal
+from cache import MemoryCache
+from database import get_db
+from passwords import get_password_hash, needs_rehash, run_hashing, verify_password
 from pydantic_models import TokenData, User
 from schemas import User as SQLAlchemyUser
 
@@ -14,24 +19,29 @@ SECRET_KEY = "your-secret-key-change-this-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Resolved users per (subject, token). Kept per worker, so a change made
+# through another worker is seen after at most USER_CACHE_TTL seconds.
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "60"))
+user_cache = MemoryCache(max_entries=int(os.getenv("USER_CACHE_MAX_ENTRIES", "4096")))
+
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against its hash."""
-    return check_password_hash(hashed_password, plain_password)
-
-def get_password_hash(password: str) -> str:
-    """Hash a password."""
-    return generate_password_hash(password)
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    """Authenticate a user by email and password.
 
-def authenticate_user(db: Session, email: str, password: str):
-    """Authenticate a user by email and password."""
-    user = db.query(SQLAlchemyUser).filter(SQLAlchemyUser.email == email).first()
+    Verification runs in the password executor. A hash made with outdated
+    parameters is replaced while the plain password is at hand.
+    """
+    user = (await db.execute(select(SQLAlchemyUser).where(SQLAlchemyUser.email == email))).scalars().first()
     if not user:
         return False
-    if not verify_password(password, user.lozinka):
+    if not await run_hashing(verify_password, password, user.lozinka):
         return False
+    if needs_rehash(user.lozinka):
+        user.lozinka = await run_hashing(get_password_hash, password)
+        await db.commit()
+        invalidate_user(user.email)
     return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -45,8 +55,29 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    """Get current user from JWT token."""
+def user_tag(email: str) -> str:
+    return f"user:{email}"
+
+def invalidate_user(*emails: Optional[str]) -> None:
+    """Forget cached users for these token subjects; call after the change is committed."""
+    user_cache.invalidate(user_tag(email) for email in emails if email)
+
+def detached_user(user: SQLAlchemyUser) -> SQLAlchemyUser:
+    """Copy of the user's columns that is not bound to any session.
+
+    The request session expires its instances on commit and is closed
+    afterwards, so the cached copy must not be the session's own object.
+    """
+    return SQLAlchemyUser(**{
+        attr.key: getattr(user, attr.key) for attr in inspect(SQLAlchemyUser).column_attrs
+    })
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    """Get current user from JWT token.
+
+    Users are cached for USER_CACHE_TTL seconds (never past the token's
+    expiry); on a miss the user is loaded through the request's session.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -61,14 +92,21 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
     except JWTError:
         raise credentials_exception
 
-    db = SessionLocal()
-    try:
-        user = db.query(SQLAlchemyUser).filter(SQLAlchemyUser.email == token_data.email).first()
-        if user is None:
-            raise credentials_exception
+    key = f"{token_data.email}:{token}"
+    user = user_cache.get(key)
+    if user is not None:
         return user
-    finally:
-        db.close()
+
+    tags = [user_tag(token_data.email)]
+    generation = user_cache.generation(tags)
+    user = db.query(SQLAlchemyUser).filter(SQLAlchemyUser.email == token_data.email).first()
+    if user is None:
+        raise credentials_exception
+    user = detached_user(user)
+    ttl = min(USER_CACHE_TTL, int(payload.get("exp", 0) - time.time()))
+    if ttl > 0:
+        user_cache.set(key, user, tags, ttl, generation)
+    return user
 
 def get_current_active_user(current_user: SQLAlchemyUser = Depends(get_current_user)):
     """Get current active user."""
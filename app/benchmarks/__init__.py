@@ -0,0 +1 @@
+"""Micro-benchmarks, run as ``python -m benchmarks.<name>`` from the app directory."""
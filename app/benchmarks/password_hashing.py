@@ -0,0 +1,58 @@
+"""Logins per second per core for a password hash method.
+
+    python -m benchmarks.password_hashing --method scrypt:32768:8:1 --seconds 5
+
+Each login is one verification of a stored hash. The run is repeated with one
+worker and with ``--workers`` threads to show how far the executor scales.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+
+from passwords import PASSWORD_HASH_METHOD, verify_password
+
+PASSWORD = "password123"
+
+
+def logins_per_second(stored_hash: str, workers: int, seconds: float) -> float:
+    deadline = time.perf_counter() + seconds
+
+    def worker() -> int:
+        count = 0
+        while time.perf_counter() < deadline:
+            verify_password(PASSWORD, stored_hash)
+            count += 1
+        return count
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        total = sum(executor.map(lambda _: worker(), range(workers)))
+    return total / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.password_hashing", description="Measure password verifications per second."
+    )
+    parser.add_argument("--method", default=PASSWORD_HASH_METHOD, help="werkzeug hash method and cost")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="parallel verifications")
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration of each run")
+    args = parser.parse_args()
+
+    stored_hash = generate_password_hash(PASSWORD, method=args.method)
+    single = logins_per_second(stored_hash, 1, args.seconds)
+    parallel = logins_per_second(stored_hash, args.workers, args.seconds)
+
+    print(f"{'method':<16} {args.method}")
+    print(f"{'1 worker':<16} {single:8.1f} logins/s  ({1000 / single:.1f} ms per login)")
+    print(f"{f'{args.workers} workers':<16} {parallel:8.1f} logins/s  ({parallel / args.workers:.1f} per core)")
+
+
+if __name__ == "__main__":
+    main()
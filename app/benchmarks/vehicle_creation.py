@@ -0,0 +1,143 @@
+"""Vehicle listings created per second under concurrent uploads.
+
+    python -m benchmarks.vehicle_creation --concurrency 1 8 32 --requests 200 --images 5
+
+Each request posts a listing with ``--images`` generated JPEGs to POST /vozila/
+through the ASGI app in this process. The numbers therefore cover upload
+parsing, file writes, image hashing and the insert transaction, but no
+network. While the uploads run, a ticker measures how far the event loop
+falls behind, which shows whether blocking work leaked onto it.
+
+Every request creates a vehicle and an ad, so point DATABASE_URL at a
+throwaway database whose tables exist (python database.py). The uploaded
+files are removed afterwards.
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import time
+from datetime import datetime
+from typing import List, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from PIL import Image
+
+from auth import create_access_token
+from database import SessionLocal, ensure_database
+from main import app
+from routers.vozila import UPLOAD_DIR, remove_files
+from schemas import User
+
+BENCHMARK_EMAIL = "benchmark@autoplac.local"
+FORM = {
+    "marka": "Benchmark",
+    "model": "Upload",
+    "godinaProizvodnje": "2015",
+    "cena": "9999",
+    "tipGoriva": "Dizel",
+    "kilometraza": "150000 km",
+    "lokacija": "Beograd",
+    "stanje": "Polovno",
+    "kubikaza": "1995",
+    "opis": "Benchmark listing",
+    "tipKaroserije": "Limuzina",
+    "snagaMotoraKW": "110",
+    "klima": "Automatska",
+    "tipMenjaca": "Manuelni",
+    "euroNorma": "Euro 6",
+}
+TICK = 0.005
+
+
+def jpeg(width: int, height: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.effect_noise((width, height), 64).convert("RGB").save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def benchmark_token() -> str:
+    db = SessionLocal()
+    try:
+        if db.query(User.id).filter(User.email == BENCHMARK_EMAIL).first() is None:
+            now = datetime.utcnow()
+            db.add(User(
+                korisnickoIme="benchmark",
+                email=BENCHMARK_EMAIL,
+                lozinka="!",  # Not a valid hash, so the account cannot log in
+                tipKorisnika="Korisnik",
+                created_at=now,
+                updated_at=now
+            ))
+            db.commit()
+    finally:
+        db.close()
+    return create_access_token(data={"sub": BENCHMARK_EMAIL})
+
+
+async def watch_loop(lag: List[float], stop: asyncio.Event) -> None:
+    """Record the worst delay of a TICK-second sleep."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lag[0] = max(lag[0], time.perf_counter() - start - TICK)
+
+
+async def create_listings(
+    requests: int, concurrency: int, image: bytes, images: int, token: str
+) -> Tuple[float, float, List[str]]:
+    """Listings per second, worst event loop lag in seconds and the saved file names."""
+    pending = iter(range(requests))
+    saved: List[str] = []
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        for _ in pending:
+            files = [("slike", (f"benchmark_{i}.jpg", image, "image/jpeg")) for i in range(images)]
+            response = await client.post("/vozila/", data=FORM, files=files, headers=headers)
+            response.raise_for_status()
+            saved.extend(response.json()["slike"].split(","))
+
+    lag = [0.0]
+    stop = asyncio.Event()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        watcher = asyncio.create_task(watch_loop(lag, stop))
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await watcher
+    return requests / elapsed, lag[0], saved
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.vehicle_creation", description="Measure vehicle listings created per second."
+    )
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="parallel uploads per run")
+    parser.add_argument("--requests", type=int, default=100, help="listings created per run")
+    parser.add_argument("--images", type=int, default=5, help="images per listing")
+    parser.add_argument("--size", default="1280x960", help="image dimensions, WIDTHxHEIGHT")
+    args = parser.parse_args()
+
+    width, height = (int(value) for value in args.size.split("x"))
+    image = jpeg(width, height)
+    ensure_database()
+    token = benchmark_token()
+
+    print(f"{args.images} x {len(image) // 1024} KB images per listing, {args.requests} listings per run")
+    # Warm-up, so lazy imports and the first connections are not measured
+    runs = [(1, 1)] + [(args.requests, concurrency) for concurrency in args.concurrency]
+    for index, (requests, concurrency) in enumerate(runs):
+        rate, lag, saved = asyncio.run(create_listings(requests, concurrency, image, args.images, token))
+        remove_files([str(UPLOAD_DIR / name) for name in saved])
+        if index:
+            print(f"{f'{concurrency} concurrent':<16} {rate:8.1f} listings/s  (event loop lag up to {lag * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""Bulk vehicle import from CSV or NDJSON uploads.
+
+Rows are read one at a time from the spooled upload and validated with
+VoziloCreate. Valid rows are inserted BULK_IMPORT_BATCH at a time: one
+multi-row INSERT ... RETURNING for the vehicles, then one each for their ads,
+images and the facet counts. Memory use therefore depends on the batch size,
+not on the file size. Each batch is its own transaction, so a database error
+fails that batch's rows and the import carries on with the next one.
+"""
+import csv
+import io
+import json
+import os
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple, Union
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from facets import adjust_facet_counts, facet_values
+from images import describe_image, parse_slike
+from lokacije import grad_ids_by_kljuc, grad_kljuc
+from pydantic_models import BulkImportError, BulkImportResult, VoziloCreate
+from schemas import Oglas, Vozilo, VoziloSlika
+
+BULK_IMPORT_BATCH = int(os.getenv("BULK_IMPORT_BATCH", "1000"))
+# Row errors listed in the response; further failures are only counted
+BULK_IMPORT_MAX_ERRORS = int(os.getenv("BULK_IMPORT_MAX_ERRORS", "1000"))
+# Lifetime of the ads created for imported vehicles, as for POST /vozila/
+AD_DAYS = 30
+
+# A parsed row, or the reason it could not be parsed
+RawRow = Union[dict, str]
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    """"csv" or "ndjson" from the upload's file name or content type."""
+    name = (filename or "").lower()
+    if name.endswith(".csv") or content_type == "text/csv":
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")) or content_type in ("application/x-ndjson", "application/jsonl"):
+        return "ndjson"
+    return None
+
+
+def iter_rows(source: BinaryIO, format: str) -> Iterator[Tuple[int, RawRow]]:
+    """(row number, row) pairs read lazily from a UTF-8 CSV (with header) or NDJSON file."""
+    text = io.TextIOWrapper(source, encoding="utf-8-sig", newline="" if format == "csv" else None)
+    try:
+        if format == "csv":
+            for number, row in enumerate(csv.DictReader(text), start=1):
+                # Empty cells are missing values; cells beyond the header (key None) are dropped
+                yield number, {key: value for key, value in row.items() if key is not None and value != ""}
+            return
+
+        number = 0
+        for line in text:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield number, f"Invalid JSON: {str(e)}"
+                continue
+            yield number, row if isinstance(row, dict) else "Expected a JSON object"
+    finally:
+        # Leave the upload open; FastAPI closes it
+        text.detach()
+
+
+def validation_messages(error: ValidationError) -> List[str]:
+    return [
+        f"{'.'.join(str(part) for part in detail['loc']) or 'row'}: {detail['msg']}"
+        for detail in error.errors()
+    ]
+
+
+class VoziloImporter:
+    def __init__(self, db: Session, korisnikID: int):
+        self.db = db
+        self.korisnikID = korisnikID
+        self.grad_ids = grad_ids_by_kljuc(db)
+        self.result = BulkImportResult()
+        self.batch: List[Tuple[int, VoziloCreate]] = []
+
+    def fail(self, number: int, messages: List[str]) -> None:
+        self.result.failed += 1
+        if len(self.result.errors) < BULK_IMPORT_MAX_ERRORS:
+            self.result.errors.append(BulkImportError(row=number, errors=messages))
+
+    def add(self, number: int, row: RawRow) -> None:
+        if isinstance(row, str):
+            self.fail(number, [row])
+            return
+        try:
+            vozilo = VoziloCreate.model_validate(row)
+        except ValidationError as e:
+            self.fail(number, validation_messages(e))
+            return
+        self.batch.append((number, vozilo))
+        if len(self.batch) >= BULK_IMPORT_BATCH:
+            self.flush()
+
+    def flush(self) -> None:
+        batch, self.batch = self.batch, []
+        if not batch:
+            return
+        try:
+            self.insert([vozilo for _, vozilo in batch])
+            self.db.commit()
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            message = f"Database error: {str(getattr(e, 'orig', None) or e).strip().splitlines()[0]}"
+            for number, _ in batch:
+                self.fail(number, [message])
+            return
+        self.result.imported += len(batch)
+
+    def insert(self, vozila: List[VoziloCreate]) -> None:
+        now = datetime.utcnow()
+        today = date.today()
+        vozilo_ids = self.db.scalars(
+            insert(Vozilo).returning(Vozilo.voziloID, sort_by_parameter_order=True),
+            [
+                {
+                    **vozilo.model_dump(),
+                    "gradID": self.grad_ids.get(grad_kljuc(vozilo.lokacija)),
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for vozilo in vozila
+            ]
+        ).all()
+
+        self.db.execute(insert(Oglas), [
+            {
+                "datumKreiranja": today,
+                "datumIsteka": today + timedelta(days=AD_DAYS),
+                "voziloID": voziloID,
+                "korisnikID": self.korisnikID,
+                "statusOglasa": 'aktivan',
+                "created_at": now,
+                "updated_at": now,
+            }
+            for voziloID in vozilo_ids
+        ])
+
+        slike = [
+            {
+                "voziloID": voziloID,
+                "putanja": putanja,
+                "pozicija": pozicija,
+                "created_at": now,
+                # Every row needs the same keys for a multi-row INSERT
+                "sirina": None,
+                "visina": None,
+                "velicinaBajtova": None,
+                "hash": None,
+                **describe_image(putanja),
+            }
+            for voziloID, vozilo in zip(vozilo_ids, vozila)
+            for pozicija, putanja in enumerate(parse_slike(vozilo.slike))
+        ]
+        if slike:
+            self.db.execute(insert(VoziloSlika), slike)
+
+        adjust_facet_counts(self.db, Counter(
+            item for vozilo in vozila for item in facet_values(vozilo).items()
+        ))
+
+
+def import_vozila(db: Session, rows: Iterable[Tuple[int, RawRow]], korisnikID: int) -> BulkImportResult:
+    """Create a vehicle and an active ad for every valid row; report the rest by row number."""
+    importer = VoziloImporter(db, korisnikID)
+    number = 0
+    try:
+        for number, row in rows:
+            importer.add(number, row)
+    except (UnicodeDecodeError, csv.Error) as e:
+        # The rest of the file cannot be read; keep what was imported so far
+        importer.fail(number + 1, [f"Unreadable file from this row on: {str(e)}"])
+    importer.flush()
+    return importer.result
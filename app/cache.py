@@ -0,0 +1,289 @@
+"""Response cache for hot public read endpoints.
+
+Entries are tagged with the resources they were built from ("vozila",
+"vozilo:42", "oglasi") and write endpoints invalidate those tags after they
+commit. Every tag also has a generation number: a response that was being
+built while one of its tags was invalidated is not stored, so a slow reader
+cannot put pre-commit data back into the cache.
+
+Responses that carry an ETag are cached per ETag. The ETag is computed from
+the live row versions, so a body cached before a write this worker never
+heard about (another worker made it) is simply not found under the new ETag,
+and a cached body is never sent with an ETag it was not built for.
+
+The backend is chosen with RESPONSE_CACHE_URL: unset (or "memory://") keeps
+an in-process LRU per worker, "redis://host:port/db" shares one cache
+between workers. Configure Redis with ``maxmemory-policy allkeys-lru`` so it
+evicts like the in-process backend.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from starlette.concurrency import run_in_threadpool
+
+CACHE_HEADER = "X-Cache"
+DEFAULT_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "60"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+
+# (body, headers) of a serialized response
+Entry = Tuple[bytes, Dict[str, str]]
+
+
+class MemoryCache:
+    """Thread-safe in-process LRU cache with per-entry TTL."""
+
+    name = "memory"
+    # Calls only take a lock, so async endpoints can make them on the event loop
+    blocking = False
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Entry, Tuple[str, ...]]]" = OrderedDict()
+        self._tags: Dict[str, set] = {}
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def generation(self, tags: Iterable[str]) -> Tuple[int, ...]:
+        with self._lock:
+            return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def set(self, key: str, entry: Entry, tags: List[str], ttl: int, generation: Tuple[int, ...]) -> None:
+        with self._lock:
+            if tuple(self._generations.get(tag, 0) for tag in tags) != generation:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + ttl, entry, tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+                for key in self._tags.pop(tag, ()):
+                    if key in self._entries:
+                        self._drop(key)
+                        self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _drop(self, key: str) -> None:
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+
+
+class RedisCache:
+    """Cache shared by all workers; counters are kept in Redis as well."""
+
+    name = "redis"
+    # Calls wait on the network; async endpoints make them in the threadpool
+    blocking = True
+
+    def __init__(self, url: str, prefix: str = "autoplac:cache:"):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def _key(self, *parts: str) -> str:
+        return self._prefix + ":".join(parts)
+
+    def get(self, key: str) -> Optional[Entry]:
+        # A hit is one round trip; misses, which go on to build the response, are counted separately
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.get(self._key("entry", key))
+        pipe.incr(self._key("stats", "lookups"))
+        raw, _ = pipe.execute()
+        if raw is None:
+            self._redis.incr(self._key("stats", "misses"))
+            return None
+        item = json.loads(raw)
+        return item["body"].encode(), item["headers"]
+
+    def generation(self, tags: Iterable[str]) -> Tuple[int, ...]:
+        tags = list(tags)
+        if not tags:
+            return ()
+        values = self._redis.mget([self._key("gen", tag) for tag in tags])
+        return tuple(int(value or 0) for value in values)
+
+    def set(self, key: str, entry: Entry, tags: List[str], ttl: int, generation: Tuple[int, ...]) -> None:
+        if self.generation(tags) != generation:
+            return
+        body, headers = entry
+        pipe = self._redis.pipeline()
+        pipe.set(self._key("entry", key), json.dumps({"body": body.decode(), "headers": headers}), ex=ttl)
+        for tag in tags:
+            pipe.sadd(self._key("tag", tag), key)
+            pipe.expire(self._key("tag", tag), ttl * 2)
+        pipe.execute()
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            tag_key = self._key("tag", tag)
+            keys = [self._key("entry", key.decode()) for key in self._redis.smembers(tag_key)]
+            pipe = self._redis.pipeline()
+            pipe.incr(self._key("gen", tag))
+            if keys:
+                pipe.delete(*keys)
+                pipe.incrby(self._key("stats", "invalidations"), len(keys))
+            pipe.delete(tag_key)
+            pipe.execute()
+
+    def clear(self) -> None:
+        for key in self._redis.scan_iter(match=self._prefix + "*"):
+            self._redis.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups, misses, invalidations = self._redis.mget([
+            self._key("stats", "lookups"), self._key("stats", "misses"), self._key("stats", "invalidations")
+        ])
+        return {
+            "backend": self.name,
+            "hits": int(lookups or 0) - int(misses or 0),
+            "misses": int(misses or 0),
+            "entries": None,
+            "evictions": None,
+            "invalidations": int(invalidations or 0),
+        }
+
+
+def create_cache(url: Optional[str] = None):
+    url = url or os.getenv("RESPONSE_CACHE_URL", "memory://")
+    if url.startswith(("redis://", "rediss://")):
+        return RedisCache(url)
+    return MemoryCache()
+
+
+response_cache = create_cache()
+
+
+def cache_key(request: Request, response: Optional[Response] = None) -> str:
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    key = f"{request.url.path}?{query}"
+    etag = response.headers.get("etag") if response is not None else None
+    return f"{key}#{etag}" if etag else key
+
+
+def cached_response(
+    request: Request,
+    response: Response,
+    response_model: Any,
+    tags: List[str],
+    build: Callable[[], Any],
+    ttl: int = DEFAULT_TTL,
+) -> Response:
+    """Serve the response for ``request`` from the cache, building it on a miss.
+
+    ``build`` returns the endpoint result and may set headers on ``response``;
+    both the serialized body and those headers are cached. Headers already set
+    on ``response`` before the call are sent on hits as well; an ETag among them
+    is part of the cache key.
+    """
+    key = cache_key(request, response)
+    entry = response_cache.get(key)
+    if entry is not None:
+        return entry_response(entry, response, "HIT")
+    generation = response_cache.generation(tags)
+    entry = serialize(response_model, build(), response)
+    response_cache.set(key, entry, tags, ttl, generation)
+    return entry_response(entry, response, "MISS")
+
+
+async def cached_response_async(
+    request: Request,
+    response: Response,
+    response_model: Any,
+    tags: List[str],
+    build: Callable[[], Awaitable[Any]],
+    ttl: int = DEFAULT_TTL,
+) -> Response:
+    """cached_response for endpoints that build their result with an AsyncSession."""
+    key = cache_key(request, response)
+    entry = await off_loop(response_cache.get, key)
+    if entry is not None:
+        return entry_response(entry, response, "HIT")
+    generation = await off_loop(response_cache.generation, tags)
+    entry = serialize(response_model, await build(), response)
+    await off_loop(response_cache.set, key, entry, tags, ttl, generation)
+    return entry_response(entry, response, "MISS")
+
+
+async def off_loop(function: Callable[..., Any], *args: Any) -> Any:
+    """Call a cache backend method without blocking the event loop on a network backend."""
+    if response_cache.blocking:
+        return await run_in_threadpool(function, *args)
+    return function(*args)
+
+
+def serialize(response_model: Any, result: Any, response: Response) -> Entry:
+    adapter = TypeAdapter(response_model)
+    return adapter.dump_json(adapter.validate_python(result, from_attributes=True)), response_headers(response)
+
+
+def entry_response(entry: Entry, response: Response, status: str) -> Response:
+    body, headers = entry
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={**headers, **response_headers(response), CACHE_HEADER: status},
+    )
+
+
+def response_headers(response: Response) -> Dict[str, str]:
+    return {name: value for name, value in response.headers.items() if name != "content-length"}
+
+
+invalidation_listeners: List[Callable[[Tuple[str, ...]], None]] = []
+
+
+def on_invalidate(listener: Callable[[Tuple[str, ...]], None]) -> None:
+    """Call ``listener`` with the tags of every later invalidation in this process."""
+    invalidation_listeners.append(listener)
+
+
+def invalidate(*tags: str) -> None:
+    """Drop every cached response built from any of ``tags``; call after commit."""
+    response_cache.invalidate(tags)
+    for listener in invalidation_listeners:
+        listener(tags)
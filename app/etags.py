@@ -0,0 +1,42 @@
+"""Strong ETags and conditional GET handling.
+
+An ETag is a hash of the row versions (``verzija``) a response is built
+from, so it can be computed with one narrow query before anything is loaded
+or serialized. A matching If-None-Match is answered with 304 and no body.
+"""
+import hashlib
+import json
+from typing import Any, Optional
+
+from fastapi import Request, Response
+
+# Clients may reuse the body but must revalidate before every use
+REVALIDATE = "public, no-cache"
+# Short-lived shared lists (featured ads); revalidated after max-age
+SHORT_LIVED = "public, max-age=30, must-revalidate"
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag for a response built from ``parts`` (ids, versions, dates)."""
+    payload = json.dumps(parts, default=str, separators=(",", ":"))
+    return '"' + hashlib.sha256(payload.encode()).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    candidates = (value.strip() for value in header.split(","))
+    return etag in (value[2:] if value.startswith("W/") else value for value in candidates)
+
+
+def conditional_get(request: Request, response: Response, etag: str, cache_control: str) -> Optional[Response]:
+    """Set the validator headers and return a 304 response if the client is up to date."""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+    return None
@@ -0,0 +1,70 @@
+"""Ad expiry.
+
+Ads whose datumIsteka has passed are moved to the ``istekao`` status by a
+single UPDATE, run at startup and then every AD_EXPIRY_INTERVAL seconds in
+each worker. The listing queries filter on statusOglasa alone, so an ad stays
+listed until the first run after its expiry day. The UPDATE bypasses the
+ORM, so it bumps ``verzija`` itself to keep the ETags derived from it honest.
+
+Only the first worker to run after an ad expires changes anything, so only
+that worker invalidates its cache. With the in-process cache the other
+workers notice at once where an ETag is involved (the vehicle page and the
+featured list are cached per ETag), but keep serving their cached ad lists
+until RESPONSE_CACHE_TTL runs out and their homepage snapshot until the next
+HOME_SNAPSHOT_INTERVAL. The Redis cache backend is shared, so there the
+invalidation reaches every worker.
+"""
+import os
+from datetime import date, datetime
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from cache import invalidate
+from database import SessionLocal
+from jobs import PeriodicJob
+from schemas import Oglas
+
+# Seconds between expiry runs in each worker, 0 disables the job
+AD_EXPIRY_INTERVAL = int(os.getenv("AD_EXPIRY_INTERVAL", "300"))
+# Statuses of ads that are live until their datumIsteka
+EXPIRING_STATUSES = ('standardniOglas', 'istaknutiOglas', 'aktivan')
+EXPIRED_STATUS = 'istekao'
+
+
+def expire_oglasi(db: Session, today: date = None) -> int:
+    """Mark the live ads that expired before ``today`` as istekao; returns the number of ads changed."""
+    vozilo_ids = db.scalars(
+        update(Oglas)
+        .where(Oglas.statusOglasa.in_(EXPIRING_STATUSES), Oglas.datumIsteka < (today or date.today()))
+        .values(statusOglasa=EXPIRED_STATUS, verzija=Oglas.verzija + 1, updated_at=datetime.utcnow())
+        .returning(Oglas.voziloID)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    if vozilo_ids:
+        # The vehicle pages show the ad status; "oglasi" also marks the homepage snapshot stale
+        invalidate("oglasi", "vozila", *(f"vozilo:{voziloID}" for voziloID in vozilo_ids))
+    return len(vozilo_ids)
+
+
+def expire_now() -> int:
+    db = SessionLocal()
+    try:
+        expired = expire_oglasi(db)
+    finally:
+        db.close()
+    if expired:
+        print(f"Expired {expired} ads")
+    return expired
+
+
+ad_expiry_job = PeriodicJob("ad expiry", expire_now, AD_EXPIRY_INTERVAL)
+
+
+if __name__ == "__main__":
+    session = SessionLocal()
+    try:
+        print(f"Expired {expire_oglasi(session)} ads")
+    finally:
+        session.close()
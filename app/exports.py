@@ -0,0 +1,100 @@
+"""Streaming CSV and NDJSON exports.
+
+Rows are read through a server-side cursor (yield_per), EXPORT_CHUNK_ROWS at
+a time. Each chunk is encoded and sent before the next one is fetched, so
+memory stays flat whatever the row count, and the first bytes go out as soon
+as the first chunk arrives. The body is produced after the endpoint has
+returned, so the export runs on its own session rather than the request's.
+"""
+import csv
+import io
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterator, List, Sequence
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select
+
+from database import SessionLocal
+from schemas import Oglas, Uplata, Vozilo
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "1000"))
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+# Query parameter pattern accepted by the export endpoints
+EXPORT_FORMAT_PATTERN = "^(csv|ndjson)$"
+
+PAYMENT_COLUMNS = (
+    Uplata.uplataID,
+    Uplata.fromUserID,
+    Uplata.toUserID,
+    Uplata.toOglasID,
+    Uplata.datumUplate,
+    Uplata.iznos,
+    Uplata.tip,
+    Uplata.created_at,
+    Uplata.updated_at,
+)
+
+LISTING_COLUMNS = (
+    Oglas.oglasID,
+    Oglas.statusOglasa,
+    Oglas.datumKreiranja,
+    Oglas.datumIsteka,
+    Oglas.datumProdaje,
+    Oglas.korisnikID,
+    Oglas.buyerID,
+    Vozilo.voziloID,
+    Vozilo.marka,
+    Vozilo.model,
+    Vozilo.godinaProizvodnje,
+    Vozilo.cena,
+    Vozilo.kilometraza,
+    Vozilo.tipGoriva,
+    Vozilo.lokacija,
+)
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def encode_rows(rows: Sequence, columns: List[str], format: str) -> bytes:
+    if format == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows([_plain(value) for value in row] for row in rows)
+        return buffer.getvalue().encode()
+    return "".join(
+        json.dumps(dict(zip(columns, (_plain(value) for value in row))), ensure_ascii=False) + "\n"
+        for row in rows
+    ).encode()
+
+
+def stream_rows(statement: Select, format: str) -> Iterator[bytes]:
+    columns = list(statement.selected_columns.keys())
+    if format == "csv":
+        yield encode_rows([columns], columns, format)
+    db = SessionLocal()
+    try:
+        result = db.execute(statement.execution_options(yield_per=EXPORT_CHUNK_ROWS))
+        for rows in result.partitions():
+            yield encode_rows(rows, columns, format)
+    finally:
+        db.close()
+
+
+def export_response(statement: Select, format: str, filename: str) -> StreamingResponse:
+    """Stream the rows of ``statement`` as an attachment named ``filename``.csv/.ndjson."""
+    return StreamingResponse(
+        stream_rows(statement, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{format}"'},
+    )
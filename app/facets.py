@@ -0,0 +1,132 @@
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from sqlalchemy import func, literal_column
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from filters import unsold_vozila_query
+from schemas import Vozilo as SQLAlchemyVozilo, VoziloFacet
+
+# Width of the godinaProizvodnje buckets, e.g. 2010 covers 2010-2014
+YEAR_BUCKET = 5
+
+# Inlined rather than bound so the SELECT and GROUP BY expressions are identical
+_BUCKET = literal_column(str(YEAR_BUCKET), type_=SQLAlchemyVozilo.godinaProizvodnje.type)
+
+FACET_COLUMNS = {
+    "marka": SQLAlchemyVozilo.marka,
+    "model": SQLAlchemyVozilo.model,
+    "tipGoriva": SQLAlchemyVozilo.tipGoriva,
+    "tipKaroserije": SQLAlchemyVozilo.tipKaroserije,
+    "lokacija": SQLAlchemyVozilo.lokacija,
+    "godinaProizvodnje": (SQLAlchemyVozilo.godinaProizvodnje // _BUCKET) * _BUCKET,
+}
+
+
+def year_bucket(godina: int) -> int:
+    return godina // YEAR_BUCKET * YEAR_BUCKET
+
+
+def facet_values(vozilo: SQLAlchemyVozilo) -> Dict[str, str]:
+    """The facet value a single vehicle contributes to each facet."""
+    return {
+        "marka": vozilo.marka,
+        "model": vozilo.model,
+        "tipGoriva": vozilo.tipGoriva,
+        "tipKaroserije": vozilo.tipKaroserije,
+        "lokacija": vozilo.lokacija,
+        "godinaProizvodnje": str(year_bucket(vozilo.godinaProizvodnje)),
+    }
+
+
+def adjust_facets(db: Session, values: Dict[str, str], delta: int) -> None:
+    """Add ``delta`` to the stored counts of ``values`` in the caller's transaction."""
+    adjust_facet_counts(db, {(facet, value): delta for facet, value in values.items()})
+
+
+def adjust_facet_counts(db: Session, deltas: Dict[Tuple[str, str], int]) -> None:
+    """Add a delta per (facet, value) to the stored counts in one upsert, e.g. for a whole import batch."""
+    if not deltas:
+        return
+    stmt = insert(VoziloFacet).values([
+        {"facet": facet, "vrednost": value, "brojVozila": delta}
+        for (facet, value), delta in deltas.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[VoziloFacet.facet, VoziloFacet.vrednost],
+        set_={"brojVozila": VoziloFacet.brojVozila + stmt.excluded.brojVozila},
+    )
+    db.execute(stmt)
+
+
+def mark_sold(db: Session, vozilo: SQLAlchemyVozilo, sold: bool) -> None:
+    """Flip the vehicle's sold flag and move it out of (or back into) the facet counts."""
+    if vozilo.prodato == sold:
+        return
+    vozilo.prodato = sold
+    adjust_facets(db, facet_values(vozilo), -1 if sold else 1)
+
+
+def count_facets(query) -> Dict[str, List[dict]]:
+    """Count every facet over the rows of ``query`` in a single GROUPING SETS scan."""
+    columns = list(FACET_COLUMNS.values())
+    rows = (
+        query.with_entities(*columns, func.count())
+        .group_by(func.grouping_sets(*columns))
+        .all()
+    )
+    counts = defaultdict(list)
+    for row in rows:
+        *values, broj = row
+        for facet, value in zip(FACET_COLUMNS, values):
+            if value is not None:
+                counts[facet].append({"value": str(value), "count": broj})
+                break
+    return _sorted(counts)
+
+
+def stored_facets(db: Session) -> Dict[str, List[dict]]:
+    """Unfiltered counts, read straight from the summary table."""
+    counts = defaultdict(list)
+    for row in db.query(VoziloFacet).filter(VoziloFacet.brojVozila > 0):
+        counts[row.facet].append({"value": row.vrednost, "count": row.brojVozila})
+    return _sorted(counts)
+
+
+def stored_total(db: Session) -> int:
+    """Number of unsold vehicles; every vehicle counts once in the marka facet."""
+    return (
+        db.query(func.coalesce(func.sum(VoziloFacet.brojVozila), 0))
+        .filter(VoziloFacet.facet == "marka")
+        .scalar()
+    )
+
+
+def rebuild_facets(db: Session) -> None:
+    """Recompute the summary table from scratch, e.g. after seeding."""
+    db.query(VoziloFacet).delete()
+    for facet, values in count_facets(unsold_vozila_query(db)).items():
+        db.add_all(
+            VoziloFacet(facet=facet, vrednost=item["value"], brojVozila=item["count"])
+            for item in values
+        )
+    db.commit()
+
+
+def _sorted(counts) -> Dict[str, List[dict]]:
+    return {
+        facet: sorted(counts.get(facet, []), key=lambda item: (-item["count"], item["value"]))
+        for facet in FACET_COLUMNS
+    }
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        rebuild_facets(session)
+        print("Facet counts rebuilt")
+    finally:
+        session.close()
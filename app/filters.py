@@ -0,0 +1,222 @@
+from typing import Callable, List, NamedTuple, Optional
+
+from fastapi import HTTPException, Query
+from sqlalchemy import Float, cast, func
+from sqlalchemy.orm import Session
+
+from images import cover_images
+from lokacije import grad_ids_within, lokacija_matches
+from schemas import KM_SORT_KEY, MAX_KM, Oglas, Vozilo as SQLAlchemyVozilo
+
+# How many featured vehicles are pinned above the first catalog page
+FEATURED_PIN_LIMIT = 4
+# Radius used when ``near`` is given without ``radius_km``
+DEFAULT_RADIUS_KM = 50.0
+
+
+def unsold_vozila_query(db: Session):
+    """Vehicles joined with their ad, excluding sold ones.
+
+    Filters on the denormalized ``Vozilo.prodato`` flag so the partial sort
+    indexes on ``vozilo`` can serve the query.
+    """
+    return (
+        db.query(SQLAlchemyVozilo, Oglas)
+        .outerjoin(Oglas, Oglas.voziloID == SQLAlchemyVozilo.voziloID)
+        .filter(~SQLAlchemyVozilo.prodato)
+    )
+
+
+def annotate_vozila(db: Session, rows) -> list:
+    """Vehicles of (vehicle, ad, ...) rows with their ad status and cover image set."""
+    covers = cover_images(db, (row[0].voziloID for row in rows))
+    vozila = []
+    for vozilo_row, oglas_row, *_ in rows:
+        is_featured = bool(oglas_row and oglas_row.statusOglasa == 'istaknutiOglas')
+        setattr(vozilo_row, 'isFeatured', is_featured)
+        setattr(vozilo_row, 'istaknuto', is_featured)
+        if oglas_row is not None:
+            setattr(vozilo_row, 'statusOglasa', oglas_row.statusOglasa)
+            setattr(vozilo_row, 'oglasID', oglas_row.oglasID)
+        setattr(vozilo_row, 'naslovnaSlika', covers.get(vozilo_row.voziloID))
+        vozila.append(vozilo_row)
+    return vozila
+
+
+class CatalogOrder(NamedTuple):
+    """Keyset ordering of catalog rows; ``key`` reads the ``columns`` values back off a row."""
+    tag: str
+    columns: list
+    key: Callable
+    descending: bool = True
+
+
+NEWEST_ORDER = CatalogOrder("newest", [SQLAlchemyVozilo.voziloID], lambda row: [row[0].voziloID])
+
+# Each mode is served by a partial (column, voziloID) index WHERE NOT prodato
+SORT_ORDERS = {
+    "newest": NEWEST_ORDER,
+    "price_asc": CatalogOrder(
+        "price_asc",
+        [SQLAlchemyVozilo.cena, SQLAlchemyVozilo.voziloID],
+        lambda row: [row[0].cena, row[0].voziloID],
+        descending=False,
+    ),
+    "price_desc": CatalogOrder(
+        "price_desc",
+        [SQLAlchemyVozilo.cena, SQLAlchemyVozilo.voziloID],
+        lambda row: [row[0].cena, row[0].voziloID],
+    ),
+    "year_desc": CatalogOrder(
+        "year_desc",
+        [SQLAlchemyVozilo.godinaProizvodnje, SQLAlchemyVozilo.voziloID],
+        lambda row: [row[0].godinaProizvodnje, row[0].voziloID],
+    ),
+    "km_asc": CatalogOrder(
+        "km_asc",
+        [KM_SORT_KEY, SQLAlchemyVozilo.voziloID],
+        lambda row: [MAX_KM if row[0].kilometrazaKm is None else row[0].kilometrazaKm, row[0].voziloID],
+        descending=False,
+    ),
+    "power_desc": CatalogOrder(
+        "power_desc",
+        [SQLAlchemyVozilo.snagaMotoraKW, SQLAlchemyVozilo.voziloID],
+        lambda row: [row[0].snagaMotoraKW, row[0].voziloID],
+    ),
+}
+
+
+def catalog_order(sort: Optional[str], filters: Optional["VoziloFilters"] = None) -> CatalogOrder:
+    """Resolve the ``sort`` parameter; a free-text query defaults to relevance."""
+    if sort is None and filters is not None and filters.q:
+        rank = filters.rank()
+        return CatalogOrder("relevance", [rank, SQLAlchemyVozilo.voziloID], lambda row: [row.rank, row[0].voziloID])
+    try:
+        return SORT_ORDERS[sort or "newest"]
+    except KeyError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Nepoznat način sortiranja: {sort}. Dozvoljeno: {', '.join(SORT_ORDERS)}"
+        )
+
+
+class VoziloFilters:
+    """Catalog filters shared by the vehicle search endpoints.
+
+    Categorical attributes match exactly (repeat the parameter to match any of
+    several values), except ``lokacija``, which ignores case and diacritics so
+    "nis" finds vehicles listed in "Niš". Numeric attributes take inclusive
+    ``min_``/``max_`` bounds and ``q`` is a free-text query over marka, model,
+    lokacija and opis.
+    ``klima`` keeps vehicles with (true) or without (false) air conditioning.
+    ``near``/``radius_km`` keep vehicles listed in cities within the radius.
+    """
+
+    EXACT_FIELDS = (
+        "tipGoriva",
+        "tipKaroserije",
+        "tipMenjaca",
+        "euroNorma",
+        "stanje",
+    )
+
+    def __init__(
+        self,
+        q: Optional[str] = None,
+        marka: Optional[str] = None,
+        model: Optional[str] = None,
+        tipGoriva: Optional[List[str]] = Query(None),
+        tipKaroserije: Optional[List[str]] = Query(None),
+        tipMenjaca: Optional[List[str]] = Query(None),
+        euroNorma: Optional[List[str]] = Query(None),
+        lokacija: Optional[List[str]] = Query(None),
+        stanje: Optional[List[str]] = Query(None),
+        ostecenje: Optional[bool] = None,
+        klima: Optional[bool] = None,
+        min_cena: Optional[float] = None,
+        max_cena: Optional[float] = None,
+        min_godina: Optional[int] = None,
+        max_godina: Optional[int] = None,
+        min_snaga: Optional[float] = None,
+        max_snaga: Optional[float] = None,
+        min_kubikaza: Optional[int] = None,
+        max_kubikaza: Optional[int] = None,
+        min_km: Optional[int] = None,
+        max_km: Optional[int] = None,
+        near: Optional[str] = None,
+        radius_km: Optional[float] = Query(None, gt=0, le=1000),
+    ):
+        self.q = q.strip() if q else None
+        self.marka = marka
+        self.model = model
+        self.tipGoriva = tipGoriva
+        self.tipKaroserije = tipKaroserije
+        self.tipMenjaca = tipMenjaca
+        self.euroNorma = euroNorma
+        self.lokacija = lokacija
+        self.stanje = stanje
+        self.ostecenje = ostecenje
+        self.klima = klima
+        self.near = near
+        self.radius_km = radius_km if radius_km is not None else DEFAULT_RADIUS_KM
+        self.ranges = (
+            (SQLAlchemyVozilo.cena, min_cena, max_cena),
+            (SQLAlchemyVozilo.godinaProizvodnje, min_godina, max_godina),
+            (SQLAlchemyVozilo.snagaMotoraKW, min_snaga, max_snaga),
+            (SQLAlchemyVozilo.kubikaza, min_kubikaza, max_kubikaza),
+            (SQLAlchemyVozilo.kilometrazaKm, min_km, max_km),
+        )
+
+    def is_empty(self) -> bool:
+        """True when no filter was supplied, i.e. the whole catalog is selected."""
+        if self.q or self.marka or self.model or self.lokacija or self.near:
+            return False
+        if self.ostecenje is not None or self.klima is not None:
+            return False
+        if any(getattr(self, field) for field in self.EXACT_FIELDS):
+            return False
+        return all(low is None and high is None for _, low, high in self.ranges)
+
+    def tsquery(self):
+        return func.websearch_to_tsquery('simple', self.q)
+
+    def rank(self):
+        """Relevance of each row for ``q``; cast so the value round-trips through a cursor."""
+        return cast(func.ts_rank(SQLAlchemyVozilo.search_vector, self.tsquery()), Float)
+
+    def apply(self, query):
+        """Add the WHERE clauses for every filter that was supplied."""
+        if self.q:
+            query = query.filter(SQLAlchemyVozilo.search_vector.op('@@')(self.tsquery()))
+        if self.marka:
+            query = query.filter(SQLAlchemyVozilo.marka.ilike(f"%{self.marka}%"))
+        if self.model:
+            query = query.filter(SQLAlchemyVozilo.model.ilike(f"%{self.model}%"))
+
+        for field in self.EXACT_FIELDS:
+            values = getattr(self, field)
+            if values:
+                column = getattr(SQLAlchemyVozilo, field)
+                query = query.filter(column == values[0] if len(values) == 1 else column.in_(values))
+        if self.lokacija:
+            query = query.filter(lokacija_matches(query.session, self.lokacija))
+
+        if self.ostecenje is not None:
+            query = query.filter(SQLAlchemyVozilo.ostecenje.is_(self.ostecenje))
+        if self.klima is not None:
+            # klima is free text; the "Bez klime" style values mean none
+            bez = SQLAlchemyVozilo.klima.ilike('%bez%')
+            query = query.filter(~bez if self.klima else bez)
+
+        if self.near:
+            grad_ids = grad_ids_within(query.session, self.near, self.radius_km)
+            if grad_ids is None:
+                raise HTTPException(status_code=400, detail=f"Nepoznat grad: {self.near}")
+            query = query.filter(SQLAlchemyVozilo.gradID.in_(grad_ids))
+
+        for column, low, high in self.ranges:
+            if low is not None:
+                query = query.filter(column >= low)
+            if high is not None:
+                query = query.filter(column <= high)
+        return query
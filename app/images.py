@@ -0,0 +1,107 @@
+import hashlib
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from PIL import Image, UnidentifiedImageError
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from schemas import Vozilo as SQLAlchemyVozilo, VoziloSlika
+
+UPLOAD_DIR = Path(__file__).resolve().parent / "uploads"
+_CHUNK_SIZE = 64 * 1024
+
+
+def parse_slike(raw: Optional[str]) -> List[str]:
+    """Image paths from the legacy ``Vozilo.slike`` text (JSON array or comma-separated)."""
+    raw = (raw or "").strip()
+    if raw.startswith("["):
+        try:
+            return [str(path) for path in json.loads(raw) if path]
+        except ValueError:
+            pass
+    return [path.strip() for path in raw.split(",") if path.strip()]
+
+
+def describe_image(putanja: str) -> dict:
+    """Size, dimensions and SHA-256 of an uploaded image; empty if the file is not on disk."""
+    path = UPLOAD_DIR / Path(putanja).name
+    if not path.is_file():
+        return {}
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    meta = {"velicinaBajtova": path.stat().st_size, "hash": digest.hexdigest()}
+
+    try:
+        # Only the header is parsed, the pixel data is never decoded
+        with Image.open(path) as image:
+            meta["sirina"], meta["visina"] = image.size
+    except (UnidentifiedImageError, OSError):
+        pass
+    return meta
+
+
+def build_slike(paths: Iterable[str]) -> List[VoziloSlika]:
+    """Image rows for ``paths`` in order; position 0 is the cover."""
+    now = datetime.utcnow()
+    return [
+        VoziloSlika(putanja=putanja, pozicija=pozicija, created_at=now, **describe_image(putanja))
+        for pozicija, putanja in enumerate(paths)
+    ]
+
+
+def cover_images_select(vozilo_ids: List[int]):
+    return select(VoziloSlika.voziloID, VoziloSlika.putanja).where(
+        VoziloSlika.voziloID.in_(vozilo_ids),
+        VoziloSlika.pozicija == 0
+    )
+
+
+def cover_images(db: Session, vozilo_ids: Iterable[int]) -> Dict[int, str]:
+    """Cover image path per vehicle, loaded for a whole page in one query."""
+    vozilo_ids = list(vozilo_ids)
+    if not vozilo_ids:
+        return {}
+    return {row.voziloID: row.putanja for row in db.execute(cover_images_select(vozilo_ids))}
+
+
+async def cover_images_async(db: AsyncSession, vozilo_ids: Iterable[int]) -> Dict[int, str]:
+    """cover_images for an AsyncSession."""
+    vozilo_ids = list(vozilo_ids)
+    if not vozilo_ids:
+        return {}
+    rows = await db.execute(cover_images_select(vozilo_ids))
+    return {row.voziloID: row.putanja for row in rows}
+
+
+def backfill_slike(connection) -> int:
+    """Create image rows for every vehicle that has a ``slike`` blob but no rows yet."""
+    pending = connection.execute(
+        select(SQLAlchemyVozilo.voziloID, SQLAlchemyVozilo.slike)
+        .where(~SQLAlchemyVozilo.slikeVozila.any())
+    ).all()
+    now = datetime.utcnow()
+    rows = [
+        {
+            "voziloID": vozilo_id,
+            "putanja": putanja,
+            "pozicija": pozicija,
+            "created_at": now,
+            "sirina": None,
+            "visina": None,
+            "velicinaBajtova": None,
+            "hash": None,
+            **describe_image(putanja),
+        }
+        for vozilo_id, raw in pending
+        for pozicija, putanja in enumerate(parse_slike(raw))
+    ]
+    if rows:
+        connection.execute(insert(VoziloSlika), rows)
+    return len(rows)
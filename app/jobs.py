@@ -0,0 +1,40 @@
+"""Periodic maintenance jobs run inside each app worker.
+
+A job calls a sync function in the threadpool once at startup and then every
+``interval`` seconds until shutdown. Every worker runs its own copy, so the
+functions must be safe to run concurrently and repeatedly.
+"""
+import asyncio
+from typing import Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+
+class PeriodicJob:
+    def __init__(self, name: str, function: Callable[[], object], interval: float):
+        self.name = name
+        self.function = function
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Schedule the job on the running loop; an interval of 0 disables it."""
+        if self.interval > 0:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await run_in_threadpool(self.function)
+            except Exception as e:
+                print(f"Error in job {self.name}: {str(e)}")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,131 @@
+from datetime import datetime
+from math import cos, radians
+from typing import Dict, List, Optional
+
+from sqlalchemy import false, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from schemas import Grad, Vozilo as SQLAlchemyVozilo
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LAT = 111.045
+
+# (naziv, latitude, longitude) of the cities vehicles are listed in
+GRADOVI = [
+    ("Beograd", 44.8176, 20.4569),
+    ("Novi Sad", 45.2671, 19.8335),
+    ("Niš", 43.3209, 21.8958),
+    ("Kragujevac", 44.0128, 20.9114),
+    ("Subotica", 46.1000, 19.6658),
+    ("Zrenjanin", 45.3836, 20.3819),
+    ("Pančevo", 44.8708, 20.6403),
+    ("Čačak", 43.8914, 20.3497),
+    ("Kraljevo", 43.7258, 20.6894),
+    ("Leskovac", 42.9981, 21.9461),
+    ("Vranje", 42.5514, 21.9003),
+    ("Sombor", 45.7742, 19.1122),
+    ("Požarevac", 44.6200, 21.1833),
+    ("Užice", 43.8586, 19.8425),
+    ("Sremska Mitrovica", 44.9764, 19.6122),
+    ("Šabac", 44.7489, 19.6908),
+    ("Valjevo", 44.2751, 19.8982),
+    ("Smederevo", 44.6628, 20.9300),
+    ("Novi Pazar", 43.1367, 20.5122),
+    ("Kruševac", 43.5800, 21.3339),
+    ("Jagodina", 43.9771, 21.2612),
+    ("Zaječar", 43.9036, 22.2847),
+    ("Pirot", 43.1531, 22.5861),
+    ("Kikinda", 45.8297, 20.4653),
+    ("Vršac", 45.1167, 21.3036),
+    ("Bor", 44.0750, 22.0958),
+]
+
+# Latin diacritics folded to ASCII; the same mapping is used by the SQL backfill
+_DIACRITICS = "ŠšČčĆćŽžĐđ"
+_ASCII = "SsCcCcZzDd"
+_FOLD = str.maketrans(_DIACRITICS, _ASCII)
+
+
+def grad_kljuc(naziv: str) -> str:
+    """Normalized lookup key of a city name: "  Niš " and "nis" both become "nis"."""
+    return " ".join(naziv.translate(_FOLD).lower().split())
+
+
+def resolve_grad(db: Session, lokacija: Optional[str]) -> Optional[int]:
+    """ID of the known city a free-text ``lokacija`` refers to, if any."""
+    if not lokacija:
+        return None
+    return db.query(Grad.gradID).filter(Grad.kljuc == grad_kljuc(lokacija)).scalar()
+
+
+def lokacija_kljuc():
+    """SQL counterpart of grad_kljuc for vozilo.lokacija."""
+    return func.regexp_replace(
+        func.lower(func.trim(func.translate(SQLAlchemyVozilo.lokacija, _DIACRITICS, _ASCII))), r"\s+", " ", "g"
+    )
+
+
+def lokacija_matches(db: Session, lokacije: List[str]):
+    """Condition keeping vehicles listed in any of ``lokacije``, ignoring case and diacritics.
+
+    Known cities are matched through the indexed gradID; any other location
+    falls back to comparing the normalized lokacija text.
+    """
+    kljucevi = {grad_kljuc(lokacija) for lokacija in lokacije} - {""}
+    grad_ids = dict(db.query(Grad.kljuc, Grad.gradID).filter(Grad.kljuc.in_(kljucevi)).all()) if kljucevi else {}
+    conditions = []
+    if grad_ids:
+        conditions.append(SQLAlchemyVozilo.gradID.in_(list(grad_ids.values())))
+    unknown = kljucevi - grad_ids.keys()
+    if unknown:
+        conditions.append(lokacija_kljuc().in_(unknown))
+    return or_(*conditions) if conditions else false()
+
+
+def grad_ids_by_kljuc(db: Session) -> Dict[str, int]:
+    """Every known city's ID by lookup key, for resolving many locations without a query each."""
+    return dict(db.query(Grad.kljuc, Grad.gradID).all())
+
+
+def grad_ids_within(db: Session, naziv: str, radius_km: float):
+    """Subquery of city IDs within ``radius_km`` of the named city, or None if it is unknown.
+
+    A latitude/longitude bounding box narrows the candidates through the
+    (sirina, duzina) index; the exact haversine distance is only evaluated on
+    the cities inside the box.
+    """
+    center = db.query(Grad).filter(Grad.kljuc == grad_kljuc(naziv)).first()
+    if center is None:
+        return None
+
+    d_lat = radius_km / KM_PER_DEGREE_LAT
+    d_lon = radius_km / (KM_PER_DEGREE_LAT * max(cos(radians(center.sirina)), 0.01))
+    lat1, lon1 = radians(center.sirina), radians(center.duzina)
+    lat2, lon2 = func.radians(Grad.sirina), func.radians(Grad.duzina)
+    distance = 2 * EARTH_RADIUS_KM * func.asin(func.sqrt(
+        func.power(func.sin((lat2 - lat1) / 2), 2)
+        + cos(lat1) * func.cos(lat2) * func.power(func.sin((lon2 - lon1) / 2), 2)
+    ))
+    return select(Grad.gradID).where(
+        Grad.sirina.between(center.sirina - d_lat, center.sirina + d_lat),
+        Grad.duzina.between(center.duzina - d_lon, center.duzina + d_lon),
+        distance <= radius_km,
+    )
+
+
+def backfill_gradovi(connection) -> None:
+    """Insert missing cities and link every vehicle to the city its lokacija names."""
+    existing = set(connection.execute(select(Grad.kljuc)).scalars())
+    missing = [
+        {"naziv": naziv, "kljuc": grad_kljuc(naziv), "sirina": lat, "duzina": lon, "created_at": datetime.utcnow()}
+        for naziv, lat, lon in GRADOVI
+        if grad_kljuc(naziv) not in existing
+    ]
+    if missing:
+        connection.execute(insert(Grad), missing)
+
+    connection.execute(
+        update(SQLAlchemyVozilo)
+        .where(SQLAlchemyVozilo.gradID.is_(None), Grad.kljuc == lokacija_kljuc())
+        .values(gradID=Grad.gradID)
+    )
@@ -4,12 +4,23 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from fastapi import FastAPI, Request
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm.exc import StaleDataError
 import os
 from pathlib import Path
-from routers import users, oglasi, vozila, admin
+from routers import users, oglasi, vozila, admin, home
+from pagination import NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, TOTAL_ESTIMATED_HEADER
+from cache import CACHE_HEADER
+from database import ensure_database
+from snapshot import home_snapshot
+from rollups import revenue_rollup_job
+from expiry import ad_expiry_job
+from querycount import (
+    QUERY_BUDGET, SERVER_TIMING_HEADER, SLOW_SQL_MS, SQL_INSTRUMENTATION, SQL_TIMING, count_queries, log_slow_request
+)
 
 app = FastAPI(title="AutoPlac AI", version="1.0.0")
 
@@ -30,8 +41,29 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, TOTAL_ESTIMATED_HEADER, CACHE_HEADER, SERVER_TIMING_HEADER],
 )
 
+if SQL_INSTRUMENTATION:
+    # Statement budget, Server-Timing and slow request logging, see querycount.py
+    @app.middleware("http")
+    async def instrument_sql(request: Request, call_next):
+        with count_queries(QUERY_BUDGET or None) as counter:
+            response = await call_next(request)
+        if SQL_TIMING:
+            response.headers.append(SERVER_TIMING_HEADER, counter.server_timing())
+        if SLOW_SQL_MS and counter.total_time * 1000 >= SLOW_SQL_MS:
+            log_slow_request(request.method, request.url.path, response.status_code, counter)
+        return response
+
+@app.exception_handler(StaleDataError)
+async def conflicting_update(request: Request, exc: StaleDataError):
+    # verzija is a version_id_col: the row was changed (e.g. by the ad expiry job) after this request loaded it
+    return JSONResponse(
+        status_code=409,
+        content={"detail": "Podaci su u međuvremenu izmenjeni, osvežite stranicu i pokušajte ponovo"}
+    )
+
 templates = Jinja2Templates(directory="templates")
 
 # Include all routers
@@ -39,6 +71,20 @@ app.include_router(users.router)
 app.include_router(oglasi.router)
 app.include_router(vozila.router)
 app.include_router(admin.router)
+app.include_router(home.router)
+
+@app.on_event("startup")
+async def start_background_jobs():
+    await run_in_threadpool(ensure_database)
+    home_snapshot.start()
+    revenue_rollup_job.start()
+    ad_expiry_job.start()
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    await home_snapshot.stop()
+    await revenue_rollup_job.stop()
+    await ad_expiry_job.stop()
 
 @app.get("/", response_class=HTMLResponse)
 def home(request: Request):
@@ -57,6 +103,7 @@ def api_info():
                 "me": "/auth/me"
             },
             "advertisements": "/oglasi/",
-            "vehicles": "/vozila/"
+            "vehicles": "/vozila/",
+            "home": "/home/snapshot"
         }
     }
\ No newline at end of file
@@ -0,0 +1,21 @@
+"""Stored, GIN-indexed tsvector over marka, model, lokacija and opis."""
+from sqlalchemy import text
+
+
+def upgrade(connection):
+    connection.execute(text("""
+        ALTER TABLE vozilo ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', marka || ' ' || model), 'A') ||
+            setweight(to_tsvector('simple', lokacija), 'B') ||
+            setweight(to_tsvector('simple', opis), 'C')
+        ) STORED
+    """))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_vozilo_search_vector ON vozilo USING gin (search_vector)"
+    ))
+
+
+def downgrade(connection):
+    connection.execute(text("DROP INDEX IF EXISTS ix_vozilo_search_vector"))
+    connection.execute(text("ALTER TABLE vozilo DROP COLUMN IF EXISTS search_vector"))
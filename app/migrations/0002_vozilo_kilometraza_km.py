@@ -0,0 +1,26 @@
+"""Integer mileage column parsed from the free-text kilometraza, with a B-tree index."""
+from sqlalchemy import text
+
+
+def upgrade(connection):
+    connection.execute(text('ALTER TABLE vozilo ADD COLUMN IF NOT EXISTS "kilometrazaKm" INTEGER'))
+    # Keep only the digits ("150.000 km" -> 150000); values too long for an integer stay NULL
+    connection.execute(text(r"""
+        UPDATE vozilo
+        SET "kilometrazaKm" = CAST(digits AS INTEGER)
+        FROM (
+            SELECT "voziloID" AS id, regexp_replace(kilometraza, '\D', '', 'g') AS digits
+            FROM vozilo
+        ) parsed
+        WHERE vozilo."voziloID" = parsed.id
+          AND vozilo."kilometrazaKm" IS NULL
+          AND length(parsed.digits) BETWEEN 1 AND 9
+    """))
+    connection.execute(text(
+        'CREATE INDEX IF NOT EXISTS "ix_vozilo_kilometrazaKm" ON vozilo ("kilometrazaKm")'
+    ))
+
+
+def downgrade(connection):
+    connection.execute(text('DROP INDEX IF EXISTS "ix_vozilo_kilometrazaKm"'))
+    connection.execute(text('ALTER TABLE vozilo DROP COLUMN IF EXISTS "kilometrazaKm"'))
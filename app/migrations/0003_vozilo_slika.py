@@ -0,0 +1,92 @@
+"""Normalized vozilo_slika table, backfilled from the legacy slike blob.
+
+The backfill is frozen here as it was when the table was introduced, rather
+than calling images.py, so later changes to the application code cannot
+change what this migration does.
+"""
+import hashlib
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from PIL import Image, UnidentifiedImageError
+from sqlalchemy import text
+
+UPLOAD_DIR = Path(__file__).resolve().parent.parent / "uploads"
+_CHUNK_SIZE = 64 * 1024
+
+
+def parse_slike(raw: Optional[str]) -> List[str]:
+    """Image paths from the slike text (JSON array or comma-separated)."""
+    raw = (raw or "").strip()
+    if raw.startswith("["):
+        try:
+            return [str(path) for path in json.loads(raw) if path]
+        except ValueError:
+            pass
+    return [path.strip() for path in raw.split(",") if path.strip()]
+
+
+def describe_image(putanja: str) -> dict:
+    """Size, dimensions and SHA-256 of an uploaded image; NULLs if the file is not on disk."""
+    meta = {"sirina": None, "visina": None, "velicinaBajtova": None, "hash": None}
+    path = UPLOAD_DIR / Path(putanja).name
+    if not path.is_file():
+        return meta
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    meta["velicinaBajtova"], meta["hash"] = path.stat().st_size, digest.hexdigest()
+
+    try:
+        with Image.open(path) as image:
+            meta["sirina"], meta["visina"] = image.size
+    except (UnidentifiedImageError, OSError):
+        pass
+    return meta
+
+
+def backfill_slike(connection) -> None:
+    """Create image rows for every vehicle that has a slike blob but no rows yet."""
+    pending = connection.execute(text("""
+        SELECT "voziloID", slike FROM vozilo
+        WHERE NOT EXISTS (SELECT 1 FROM vozilo_slika WHERE vozilo_slika."voziloID" = vozilo."voziloID")
+    """)).all()
+    now = datetime.utcnow()
+    rows = [
+        {"voziloID": vozilo_id, "putanja": putanja, "pozicija": pozicija, "created_at": now, **describe_image(putanja)}
+        for vozilo_id, raw in pending
+        for pozicija, putanja in enumerate(parse_slike(raw))
+    ]
+    if rows:
+        connection.execute(text("""
+            INSERT INTO vozilo_slika
+                ("voziloID", putanja, pozicija, sirina, visina, "velicinaBajtova", hash, created_at)
+            VALUES
+                (:voziloID, :putanja, :pozicija, :sirina, :visina, :velicinaBajtova, :hash, :created_at)
+        """), rows)
+
+
+def upgrade(connection):
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS vozilo_slika (
+            "slikaID" SERIAL PRIMARY KEY,
+            "voziloID" INTEGER NOT NULL REFERENCES vozilo ("voziloID") ON DELETE CASCADE,
+            putanja VARCHAR(255) NOT NULL,
+            pozicija INTEGER NOT NULL,
+            sirina INTEGER,
+            visina INTEGER,
+            "velicinaBajtova" INTEGER,
+            hash VARCHAR(64),
+            created_at TIMESTAMP WITHOUT TIME ZONE,
+            CONSTRAINT uq_vozilo_slika_pozicija UNIQUE ("voziloID", pozicija)
+        )
+    """))
+    backfill_slike(connection)
+
+
+def downgrade(connection):
+    connection.execute(text("DROP TABLE IF EXISTS vozilo_slika"))
@@ -0,0 +1,41 @@
+"""Denormalized vozilo.prodato flag and partial indexes for the catalog sort modes."""
+from sqlalchemy import text
+
+SORT_INDEXES = {
+    "ix_vozilo_unsold_newest": '"voziloID"',
+    "ix_vozilo_unsold_cena": 'cena, "voziloID"',
+    "ix_vozilo_unsold_godina": '"godinaProizvodnje", "voziloID"',
+    "ix_vozilo_unsold_km": 'coalesce("kilometrazaKm", 2147483647), "voziloID"',
+    "ix_vozilo_unsold_snaga": '"snagaMotoraKW", "voziloID"',
+}
+# Superseded by the partial indexes above. No migration ever created these; they
+# exist only in databases built with create_all while the model still declared
+# them, so they are always dropped with IF EXISTS and never recreated.
+PLAIN_INDEXES = (
+    '"ix_vozilo_godinaProizvodnje"',
+    "ix_vozilo_cena",
+    '"ix_vozilo_snagaMotoraKW"',
+)
+
+
+def upgrade(connection):
+    connection.execute(text(
+        "ALTER TABLE vozilo ADD COLUMN IF NOT EXISTS prodato BOOLEAN NOT NULL DEFAULT false"
+    ))
+    connection.execute(text("""
+        UPDATE vozilo SET prodato = true
+        WHERE NOT prodato AND EXISTS (
+            SELECT 1 FROM oglas
+            WHERE oglas."voziloID" = vozilo."voziloID" AND oglas."statusOglasa" = 'prodat'
+        )
+    """))
+    for name, columns in SORT_INDEXES.items():
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON vozilo ({columns}) WHERE NOT prodato"))
+    for name in PLAIN_INDEXES:
+        connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def downgrade(connection):
+    for name in SORT_INDEXES:
+        connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    connection.execute(text("ALTER TABLE vozilo DROP COLUMN IF EXISTS prodato"))
@@ -0,0 +1,91 @@
+"""City coordinates table and vozilo.gradID for radius search.
+
+The city list and the lokacija backfill are frozen here as they were when the
+table was introduced, rather than taken from lokacije.py, so later changes to
+the application code cannot change what this migration does.
+"""
+from datetime import datetime
+
+from sqlalchemy import text
+
+# (naziv, latitude, longitude)
+GRADOVI = [
+    ("Beograd", 44.8176, 20.4569),
+    ("Novi Sad", 45.2671, 19.8335),
+    ("Niš", 43.3209, 21.8958),
+    ("Kragujevac", 44.0128, 20.9114),
+    ("Subotica", 46.1000, 19.6658),
+    ("Zrenjanin", 45.3836, 20.3819),
+    ("Pančevo", 44.8708, 20.6403),
+    ("Čačak", 43.8914, 20.3497),
+    ("Kraljevo", 43.7258, 20.6894),
+    ("Leskovac", 42.9981, 21.9461),
+    ("Vranje", 42.5514, 21.9003),
+    ("Sombor", 45.7742, 19.1122),
+    ("Požarevac", 44.6200, 21.1833),
+    ("Užice", 43.8586, 19.8425),
+    ("Sremska Mitrovica", 44.9764, 19.6122),
+    ("Šabac", 44.7489, 19.6908),
+    ("Valjevo", 44.2751, 19.8982),
+    ("Smederevo", 44.6628, 20.9300),
+    ("Novi Pazar", 43.1367, 20.5122),
+    ("Kruševac", 43.5800, 21.3339),
+    ("Jagodina", 43.9771, 21.2612),
+    ("Zaječar", 43.9036, 22.2847),
+    ("Pirot", 43.1531, 22.5861),
+    ("Kikinda", 45.8297, 20.4653),
+    ("Vršac", 45.1167, 21.3036),
+    ("Bor", 44.0750, 22.0958),
+]
+
+# Latin diacritics folded to ASCII, in Python for the city keys and in SQL for lokacija
+DIACRITICS = "ŠšČčĆćŽžĐđ"
+ASCII = "SsCcCcZzDd"
+
+
+def kljuc(naziv: str) -> str:
+    return " ".join(naziv.translate(str.maketrans(DIACRITICS, ASCII)).lower().split())
+
+
+def backfill_gradovi(connection) -> None:
+    """Insert missing cities and link every vehicle to the city its lokacija names."""
+    now = datetime.utcnow()
+    connection.execute(text("""
+        INSERT INTO grad (naziv, kljuc, sirina, duzina, created_at)
+        VALUES (:naziv, :kljuc, :sirina, :duzina, :created_at)
+        ON CONFLICT (kljuc) DO NOTHING
+    """), [
+        {"naziv": naziv, "kljuc": kljuc(naziv), "sirina": lat, "duzina": lon, "created_at": now}
+        for naziv, lat, lon in GRADOVI
+    ])
+    connection.execute(text(r"""
+        UPDATE vozilo SET "gradID" = grad."gradID"
+        FROM grad
+        WHERE vozilo."gradID" IS NULL
+          AND grad.kljuc = regexp_replace(lower(trim(translate(vozilo.lokacija, :diacritics, :ascii))), '\s+', ' ', 'g')
+    """), {"diacritics": DIACRITICS, "ascii": ASCII})
+
+
+def upgrade(connection):
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS grad (
+            "gradID" SERIAL PRIMARY KEY,
+            naziv VARCHAR(255) NOT NULL,
+            kljuc VARCHAR(255) NOT NULL UNIQUE,
+            sirina FLOAT NOT NULL,
+            duzina FLOAT NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE
+        )
+    """))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_grad_sirina_duzina ON grad (sirina, duzina)"))
+    connection.execute(text(
+        'ALTER TABLE vozilo ADD COLUMN IF NOT EXISTS "gradID" INTEGER REFERENCES grad ("gradID")'
+    ))
+    connection.execute(text('CREATE INDEX IF NOT EXISTS "ix_vozilo_gradID" ON vozilo ("gradID")'))
+    backfill_gradovi(connection)
+
+
+def downgrade(connection):
+    connection.execute(text('DROP INDEX IF EXISTS "ix_vozilo_gradID"'))
+    connection.execute(text('ALTER TABLE vozilo DROP COLUMN IF EXISTS "gradID"'))
+    connection.execute(text("DROP TABLE IF EXISTS grad"))
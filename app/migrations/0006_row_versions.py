@@ -0,0 +1,14 @@
+"""Row version columns on vozilo and oglas, used to derive ETags."""
+from sqlalchemy import text
+
+TABLES = ("vozilo", "oglas")
+
+
+def upgrade(connection):
+    for table in TABLES:
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS verzija INTEGER NOT NULL DEFAULT 1"))
+
+
+def downgrade(connection):
+    for table in TABLES:
+        connection.execute(text(f"ALTER TABLE {table} DROP COLUMN IF EXISTS verzija"))
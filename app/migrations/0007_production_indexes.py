@@ -0,0 +1,55 @@
+"""Secondary indexes for the columns the routers filter on, and uniqueness of
+oglas.voziloID and users.email."""
+from sqlalchemy import text
+
+INDEXES = {
+    '"ix_oglas_korisnikID"': 'oglas ("korisnikID")',
+    '"ix_oglas_buyerID"': 'oglas ("buyerID")',
+    '"ix_oglas_statusOglasa"': 'oglas ("statusOglasa")',
+    '"ix_oglas_datumIsteka"': 'oglas ("datumIsteka")',
+    # /oglasi/active/, /oglasi/featured/ and expiry only look at live ads
+    "ix_oglas_active_istek": (
+        'oglas ("datumIsteka", "statusOglasa") '
+        "WHERE \"statusOglasa\" IN ('standardniOglas', 'istaknutiOglas')"
+    ),
+    # A seller's ads that are not sold yet
+    "ix_oglas_unsold_korisnik": "oglas (\"korisnikID\") WHERE \"statusOglasa\" <> 'prodat'",
+    '"ix_uplata_datumUplate"': 'uplata ("datumUplate")',
+    '"ix_uplata_fromUserID"': 'uplata ("fromUserID")',
+    '"ix_uplata_tip_datumUplate"': 'uplata (tip, "datumUplate")',
+}
+UNIQUE_CONSTRAINTS = {
+    '"uq_oglas_voziloID"': ("oglas", '"voziloID"'),
+    "uq_users_email": ("users", "email"),
+}
+
+
+def check_duplicates(connection, table: str, column: str) -> None:
+    duplicates = connection.execute(text(
+        f"SELECT {column} AS value, count(*) AS total FROM {table} GROUP BY {column} HAVING count(*) > 1"
+    )).all()
+    if duplicates:
+        listed = ", ".join(f"{row.value} ({row.total}x)" for row in duplicates[:10])
+        raise RuntimeError(f"Cannot make {table}.{column} unique, duplicate values: {listed}")
+
+
+def constraint_exists(connection, name: str) -> bool:
+    return connection.execute(
+        text("SELECT 1 FROM pg_constraint WHERE conname = :name"), {"name": name.strip('"')}
+    ).first() is not None
+
+
+def upgrade(connection):
+    for name, target in INDEXES.items():
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"))
+    for name, (table, column) in UNIQUE_CONSTRAINTS.items():
+        if not constraint_exists(connection, name):
+            check_duplicates(connection, table, column)
+            connection.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {name} UNIQUE ({column})"))
+
+
+def downgrade(connection):
+    for name, (table, _) in UNIQUE_CONSTRAINTS.items():
+        connection.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {name}"))
+    for name in INDEXES:
+        connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
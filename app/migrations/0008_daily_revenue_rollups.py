@@ -0,0 +1,19 @@
+"""Payment counts on izvestaj_oglas and the unique keys of the daily revenue rollups."""
+from sqlalchemy import text
+
+
+def upgrade(connection):
+    connection.execute(text('ALTER TABLE izvestaj_oglas ADD COLUMN IF NOT EXISTS "brojUplata" INTEGER'))
+    connection.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_izvestaj_dan ON izvestaj ("datumOd") WHERE "datumOd" = "datumDo"'
+    ))
+    connection.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_izvestaj_oglas_dan_tip ON izvestaj_oglas ("izvestajID", tip) '
+        'WHERE "oglasID" IS NULL'
+    ))
+
+
+def downgrade(connection):
+    connection.execute(text("DROP INDEX IF EXISTS uq_izvestaj_oglas_dan_tip"))
+    connection.execute(text("DROP INDEX IF EXISTS uq_izvestaj_dan"))
+    connection.execute(text('ALTER TABLE izvestaj_oglas DROP COLUMN IF EXISTS "brojUplata"'))
@@ -0,0 +1,18 @@
+"""Include 'aktivan' ads in ix_oglas_active_istek so the expiry job's UPDATE can use it."""
+from sqlalchemy import text
+
+
+def create_index(connection, statuses: str) -> None:
+    connection.execute(text("DROP INDEX IF EXISTS ix_oglas_active_istek"))
+    connection.execute(text(
+        'CREATE INDEX ix_oglas_active_istek ON oglas ("datumIsteka", "statusOglasa") '
+        f'WHERE "statusOglasa" IN ({statuses})'
+    ))
+
+
+def upgrade(connection):
+    create_index(connection, "'standardniOglas', 'istaknutiOglas', 'aktivan'")
+
+
+def downgrade(connection):
+    create_index(connection, "'standardniOglas', 'istaknutiOglas'")
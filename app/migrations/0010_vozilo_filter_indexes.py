@@ -0,0 +1,27 @@
+"""B-tree indexes on the vozilo columns the catalog filters on.
+
+The model has declared these since server-side filtering was added, but only
+create_all built them, so migrated databases filtered without them. The
+kilometrazaKm index is created by 0002.
+"""
+from sqlalchemy import text
+
+INDEXES = {
+    '"ix_vozilo_tipGoriva"': '"tipGoriva"',
+    '"ix_vozilo_tipKaroserije"': '"tipKaroserije"',
+    '"ix_vozilo_tipMenjaca"': '"tipMenjaca"',
+    '"ix_vozilo_euroNorma"': '"euroNorma"',
+    "ix_vozilo_lokacija": "lokacija",
+    "ix_vozilo_stanje": "stanje",
+    "ix_vozilo_kubikaza": "kubikaza",
+}
+
+
+def upgrade(connection):
+    for name, column in INDEXES.items():
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON vozilo ({column})"))
+
+
+def downgrade(connection):
+    for name in INDEXES:
+        connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
@@ -0,0 +1,98 @@
+"""Versioned schema migrations.
+
+Every module in this package named ``NNNN_description.py`` defines
+``upgrade(connection)`` and ``downgrade(connection)``. Applied versions are
+recorded in the ``schema_migrations`` table and each migration runs in its own
+transaction. Migrations are written to be idempotent so they also apply cleanly
+to a database whose tables were created by ``Base.metadata.create_all``.
+
+Run from the ``app`` directory::
+
+    python -m migrations upgrade           # apply everything pending
+    python -m migrations downgrade 0001    # roll back everything after 0001
+    python -m migrations status
+    python -m migrations roundtrip --yes   # up, down to 0000, up again (throwaway DB only)
+"""
+import importlib
+import pkgutil
+import re
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import text
+
+VERSION_TABLE = "schema_migrations"
+_MODULE_NAME = re.compile(r"^(\d{4})_\w+$")
+
+
+def discover() -> List:
+    """All migration modules in version order."""
+    modules = []
+    for info in pkgutil.iter_modules(__path__):
+        match = _MODULE_NAME.match(info.name)
+        if match:
+            module = importlib.import_module(f"{__name__}.{info.name}")
+            module.version = match.group(1)
+            modules.append(module)
+    return sorted(modules, key=lambda module: module.version)
+
+
+def applied_versions(connection) -> List[str]:
+    connection.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} ("
+        "version VARCHAR(4) PRIMARY KEY, applied_at TIMESTAMP NOT NULL)"
+    ))
+    rows = connection.execute(text(f"SELECT version FROM {VERSION_TABLE} ORDER BY version"))
+    return [row.version for row in rows]
+
+
+def upgrade(engine, target: Optional[str] = None) -> List[str]:
+    """Apply pending migrations up to and including ``target`` (default: all)."""
+    with engine.begin() as connection:
+        done = set(applied_versions(connection))
+
+    applied = []
+    for module in discover():
+        if target is not None and module.version > target:
+            break
+        if module.version in done:
+            continue
+        with engine.begin() as connection:
+            module.upgrade(connection)
+            connection.execute(
+                text(f"INSERT INTO {VERSION_TABLE} (version, applied_at) VALUES (:version, :applied_at)"),
+                {"version": module.version, "applied_at": datetime.utcnow()},
+            )
+        applied.append(module.version)
+    return applied
+
+
+def downgrade(engine, target: str) -> List[str]:
+    """Revert applied migrations newer than ``target`` (``0000`` reverts all)."""
+    with engine.begin() as connection:
+        done = set(applied_versions(connection))
+
+    reverted = []
+    for module in reversed(discover()):
+        if module.version <= target or module.version not in done:
+            continue
+        with engine.begin() as connection:
+            module.downgrade(connection)
+            connection.execute(
+                text(f"DELETE FROM {VERSION_TABLE} WHERE version = :version"),
+                {"version": module.version},
+            )
+        reverted.append(module.version)
+    return reverted
+
+
+def roundtrip(engine) -> List[str]:
+    """Apply every migration, revert them all and apply them again.
+
+    Proves each downgrade path works; run it against a throwaway database.
+    Returns the versions that were reverted and re-applied.
+    """
+    upgrade(engine)
+    reverted = downgrade(engine, "0000")
+    upgrade(engine)
+    return reverted
@@ -0,0 +1,45 @@
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migrations
+from database import ensure_database, get_engine
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m migrations", description="Apply or revert schema migrations.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    up = commands.add_parser("upgrade", help="apply pending migrations")
+    up.add_argument("target", nargs="?", help="stop after this version")
+    down = commands.add_parser("downgrade", help="revert migrations newer than TARGET")
+    down.add_argument("target", help="version to keep, 0000 reverts everything")
+    commands.add_parser("status", help="list migrations and whether they are applied")
+    check = commands.add_parser("roundtrip", help="apply, revert and re-apply every migration")
+    check.add_argument("--yes", action="store_true", help="confirm DATABASE_URL points at a throwaway database")
+    args = parser.parse_args()
+    ensure_database()
+    engine = get_engine()
+
+    if args.command == "upgrade":
+        applied = migrations.upgrade(engine, args.target)
+        print(f"Applied: {', '.join(applied) or 'nothing to do'}")
+    elif args.command == "roundtrip":
+        if not args.yes:
+            parser.error("roundtrip reverts every migration; pass --yes to run it against a throwaway database")
+        reverted = migrations.roundtrip(engine)
+        print(f"Reverted and re-applied: {', '.join(reverted) or 'nothing'}")
+    elif args.command == "downgrade":
+        reverted = migrations.downgrade(engine, args.target)
+        print(f"Reverted: {', '.join(reverted) or 'nothing to do'}")
+    else:
+        with engine.begin() as connection:
+            done = set(migrations.applied_versions(connection))
+        for module in migrations.discover():
+            state = "applied" if module.version in done else "pending"
+            print(f"{module.version}  {state:8}  {module.__name__.rsplit('.', 1)[-1]}")
+
+
+if __name__ == "__main__":
+    main()
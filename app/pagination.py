@@ -0,0 +1,133 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from typing import Any, Callable, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Session
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+TOTAL_ESTIMATED_HEADER = "X-Total-Count-Estimated"
+
+# Result sets up to this size are counted exactly, larger ones are estimated
+EXACT_COUNT_THRESHOLD = 1000
+
+
+def encode_cursor(values: Sequence[Any], tag: str) -> str:
+    """Encode the keyset values of the last row into an opaque cursor."""
+    payload = json.dumps({"s": tag, "k": list(values)}, separators=(",", ":"), default=_json_default)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, tag: str, size: int) -> list:
+    """Decode a cursor produced by encode_cursor for the same ordering."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = payload["k"]
+        if payload["s"] != tag or not isinstance(values, list) or len(values) != size:
+            raise ValueError(cursor)
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Neispravan kursor za paginaciju")
+    return values
+
+
+def _json_default(value: Any) -> str:
+    """Dates and datetimes go into cursors as ISO strings."""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot put {type(value).__name__} into a cursor")
+
+
+def _cursor_value(column, value: Any) -> Any:
+    """Turn an ISO string from a cursor back into the date or datetime its column compares with."""
+    if not isinstance(value, str):
+        return value
+    try:
+        python_type = column.type.python_type
+    except (AttributeError, NotImplementedError):
+        return value
+    if python_type not in (date, datetime):
+        return value
+    try:
+        return python_type.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Neispravan kursor za paginaciju")
+
+
+def keyset_paginate(
+    query,
+    columns: Sequence,
+    cursor: Optional[str],
+    skip: int,
+    limit: int,
+    tag: str,
+    descending: bool = False,
+):
+    """Order ``query`` by ``columns`` and return one page of rows.
+
+    ``columns`` must end with the primary key so the ordering is total. With a
+    cursor the page starts right after the row it was taken from, so the cost
+    does not grow with depth; without one the legacy ``skip`` offset is used.
+    """
+    query = query.order_by(*(c.desc() if descending else c.asc() for c in columns))
+    if cursor:
+        values = [_cursor_value(c, v) for c, v in zip(columns, decode_cursor(cursor, tag, len(columns)))]
+        bound = tuple_(*columns)
+        query = query.filter(bound < tuple_(*values) if descending else bound > tuple_(*values))
+    elif skip:
+        query = query.offset(skip)
+    return query.limit(limit).all()
+
+
+def next_cursor(rows: Sequence, limit: int, key: Callable[[Any], Sequence[Any]], tag: str) -> Optional[str]:
+    """Return the cursor for the page after ``rows``, or None on the last page."""
+    if not rows or len(rows) < limit:
+        return None
+    return encode_cursor(key(rows[-1]), tag)
+
+
+def planner_estimate(db: Session, query) -> int:
+    """Row count the Postgres planner expects ``query`` to return, without running it."""
+    compiled = query.statement.compile(
+        dialect=db.get_bind().dialect, compile_kwargs={"render_postcompile": True}
+    )
+    plan = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_total(
+    db: Session,
+    query,
+    exact: bool = False,
+    summary: Optional[Callable[[], int]] = None,
+) -> Tuple[int, bool]:
+    """Total number of rows of ``query`` and whether the number is an estimate.
+
+    ``summary`` returns a maintained count when one exists for this exact
+    query (e.g. the unfiltered catalog). Otherwise at most
+    EXACT_COUNT_THRESHOLD + 1 rows are counted and anything above the threshold
+    is left to the planner's estimate, unless ``exact`` asks for a full COUNT(*).
+    """
+    query = query.order_by(None)
+    if exact:
+        return query.count(), False
+    if summary is not None:
+        return summary(), False
+
+    bounded = (
+        db.query(func.count())
+        .select_from(query.limit(EXACT_COUNT_THRESHOLD + 1).subquery())
+        .scalar()
+    )
+    if bounded <= EXACT_COUNT_THRESHOLD:
+        return bounded, False
+    return max(planner_estimate(db, query), bounded), True
+
+
+def set_total_headers(response: Response, total: int, estimated: bool) -> None:
+    response.headers[TOTAL_COUNT_HEADER] = str(total)
+    response.headers[TOTAL_ESTIMATED_HEADER] = "true" if estimated else "false"
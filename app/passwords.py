@@ -0,0 +1,38 @@
+"""Password hashing off the event loop.
+
+Key derivation is deliberately slow, so it runs in a bounded thread pool:
+hashlib releases the GIL while deriving, which lets PASSWORD_HASH_WORKERS
+logins proceed in parallel without stalling the requests on the event loop.
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Werkzeug method string with its cost, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000".
+# Stored hashes made with other parameters are upgraded on the next successful login.
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash."""
+    return check_password_hash(hashed_password, plain_password)
+
+
+def get_password_hash(password: str) -> str:
+    """Hash a password with PASSWORD_HASH_METHOD."""
+    return generate_password_hash(password, method=PASSWORD_HASH_METHOD)
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True if the hash was made with a different method or cost than configured."""
+    return hashed_password.split("$", 1)[0] != PASSWORD_HASH_METHOD
+
+
+async def run_hashing(function, *args):
+    """Run a hashing function in the password executor without blocking the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(password_executor, function, *args)
@@ -1,7 +1,19 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+import re
+from pydantic import BaseModel, EmailStr, Field, computed_field
+from typing import Dict, Optional, List
 from datetime import datetime, date
 
+
+# Longest mileage that fits the Integer column, as in the 0002 backfill
+MAX_KM_DIGITS = 9
+KILOMETRAZA_PATTERN = rf"^\D*(?:\d\D*){{0,{MAX_KM_DIGITS}}}$"
+
+
+def parse_kilometraza(value: Optional[str]) -> Optional[int]:
+    """Mileage in km from free text such as "150.000 km"; None without digits or with too many."""
+    digits = re.sub(r"\D", "", value or "")
+    return int(digits) if 0 < len(digits) <= MAX_KM_DIGITS else None
+
 # Auth models
 class UserLogin(BaseModel):
     email: EmailStr
@@ -64,14 +76,21 @@ class VoziloBase(BaseModel):
     euroNorma: str
     kubikaza: int
 
+    # Derived from kilometraza, never taken from a request body
+    @computed_field
+    @property
+    def kilometrazaKm(self) -> Optional[int]:
+        return parse_kilometraza(self.kilometraza)
+
 class VoziloCreate(VoziloBase):
-    pass
+    kilometraza: str = Field(pattern=KILOMETRAZA_PATTERN)
 
 class VoziloUpdate(VoziloBase):
-    pass
+    kilometraza: str = Field(pattern=KILOMETRAZA_PATTERN)
 
 class Vozilo(VoziloBase):
     voziloID: int
+    naslovnaSlika: Optional[str] = None
     istaknuto: Optional[bool] = None
     isFeatured: Optional[bool] = None
     deleted_at: Optional[datetime] = None
@@ -81,6 +100,43 @@ class Vozilo(VoziloBase):
     class Config:
         from_attributes = True
 
+class VoziloSlika(BaseModel):
+    slikaID: int
+    voziloID: int
+    putanja: str
+    pozicija: int
+    sirina: Optional[int] = None
+    visina: Optional[int] = None
+    velicinaBajtova: Optional[int] = None
+    hash: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class BulkImportError(BaseModel):
+    row: int  # 1-based data row, not counting the CSV header
+    errors: List[str]
+
+class BulkImportResult(BaseModel):
+    imported: int = 0
+    failed: int = 0
+    errors: List[BulkImportError] = []  # Capped at BULK_IMPORT_MAX_ERRORS, ``failed`` counts all
+
+class FacetValue(BaseModel):
+    value: str
+    count: int
+
+class HomeCounts(BaseModel):
+    aktivnihVozila: int
+    istaknutihOglasa: int
+    prodatihVozila: int
+
+class HomeSnapshot(BaseModel):
+    featured: List[Vozilo]
+    newest: List[Vozilo]
+    counts: HomeCounts
+    generatedAt: datetime
+
 # Oglas Pydantic models
 class OglasBase(BaseModel):
     datumKreiranja: date
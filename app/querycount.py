@@ -0,0 +1,117 @@
+"""Per-request SQL statement counting and timing.
+
+database.py registers the cursor listeners below on every engine it creates.
+Statements executed inside count_queries() are counted and timed, including
+those run by sync endpoints in the threadpool and by async sessions; outside
+of it the listeners only read a ContextVar, so leaving them attached costs
+next to nothing.
+
+The middleware in main.py wraps each request in count_queries() when any of
+the settings below is on:
+
+* QUERY_BUDGET fails requests that run more statements than that, so an
+  endpoint whose query count grows with its result size (an N+1 lazy load)
+  gets a 500 in development and CI instead of quietly getting slower.
+* SQL_TIMING adds the statement count, total database time and the slowest
+  statement's time as Server-Timing metrics (visible in browser devtools).
+* SLOW_SQL_MS logs one JSON line to the ``autoplac.sql`` logger for each
+  request whose database time reaches the threshold.
+"""
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+# Maximum statements per request, 0 disables the check
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "0"))
+SQL_TIMING = os.getenv("SQL_TIMING", "false").lower() in ("1", "true", "yes")
+# Requests spending at least this many milliseconds in the database are logged, 0 disables it
+SLOW_SQL_MS = float(os.getenv("SLOW_SQL_MS", "0"))
+SQL_INSTRUMENTATION = bool(QUERY_BUDGET or SQL_TIMING or SLOW_SQL_MS)
+
+SERVER_TIMING_HEADER = "Server-Timing"
+
+slow_sql_logger = logging.getLogger("autoplac.sql")
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+class QueryCounter:
+    def __init__(self, budget: Optional[int] = None):
+        self.budget = budget
+        self.statements: List[str] = []
+        self.total_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement: Optional[str] = None
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.total_time += seconds
+        if seconds >= self.slowest_time:
+            self.slowest_time = seconds
+            self.slowest_statement = statement
+
+    def check(self) -> None:
+        if self.budget is not None and self.count > self.budget:
+            listing = "\n".join(f"  {statement}" for statement in self.statements)
+            raise QueryBudgetExceeded(
+                f"{self.count} SQL statements executed, budget is {self.budget}:\n{listing}"
+            )
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.total_time * 1000:.2f};desc="{self.count} queries", '
+            f"db-slowest;dur={self.slowest_time * 1000:.2f}"
+        )
+
+
+# Holds a mutable counter, so statements from copied contexts (threadpool, greenlets) reach it
+_current_counter: ContextVar[Optional[QueryCounter]] = ContextVar("query_counter", default=None)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    counter = _current_counter.get()
+    if counter is not None:
+        counter.statements.append(" ".join(statement.split()))
+        # Kept on the execution context, which is dropped with it if the statement fails
+        context.querycount_start = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    counter = _current_counter.get()
+    start = getattr(context, "querycount_start", None)
+    if counter is not None and start is not None:
+        counter.record(" ".join(statement.split()), time.perf_counter() - start)
+
+
+@contextmanager
+def count_queries(budget: Optional[int] = None) -> Iterator[QueryCounter]:
+    """Count and time statements executed in the block; raise QueryBudgetExceeded afterwards if over ``budget``."""
+    counter = QueryCounter(budget)
+    token = _current_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _current_counter.reset(token)
+    counter.check()
+
+
+def log_slow_request(method: str, path: str, status_code: int, counter: QueryCounter) -> None:
+    slow_sql_logger.warning(json.dumps({
+        "event": "slow_sql",
+        "method": method,
+        "path": path,
+        "status": status_code,
+        "queries": counter.count,
+        "db_ms": round(counter.total_time * 1000, 2),
+        "slowest_ms": round(counter.slowest_time * 1000, 2),
+        "slowest_statement": counter.slowest_statement,
+    }, ensure_ascii=False))
@@ -0,0 +1,220 @@
+"""Daily revenue rollups.
+
+Payments are summarized per day in ``izvestaj`` (one row with datumOd =
+datumDo = the day and its payment count) and per day and payment type in
+``izvestaj_oglas`` (lines without an ad, holding brojUplata and the iznos sum).
+
+roll_up() is incremental and idempotent: it recomputes every day from the
+last rolled-up day through yesterday, replacing what was stored for those
+days. Re-rolling the last day picks up payments recorded just after midnight,
+and running it twice, or in several workers at once, gives the same rows.
+
+revenue_by_tip() and revenue_series() answer from the rollups for the days
+they cover and from ``uplata`` only for the days after them (normally just
+today). Payments backdated into days that are already rolled up appear only
+after those days are recomputed with ``python rollups.py --since YYYY-MM-DD``.
+"""
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Date, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from jobs import PeriodicJob
+from schemas import Izvestaj, IzvestajOglas, Uplata
+
+# Seconds between rollup runs in each worker, 0 disables the job
+REVENUE_ROLLUP_INTERVAL = int(os.getenv("REVENUE_ROLLUP_INTERVAL", "3600"))
+
+PAYMENT_DAY = func.date(Uplata.datumUplate, type_=Date)
+# izvestaj rows that are daily rollups, and izvestaj_oglas rows that are their lines
+DAILY = Izvestaj.datumOd == Izvestaj.datumDo
+ROLLUP_LINE = IzvestajOglas.oglasID.is_(None)
+
+
+def rolled_up_through(db: Session) -> Optional[date]:
+    """The last day covered by the rollups, None before the first run."""
+    return db.query(func.max(Izvestaj.datumDo)).filter(DAILY, Izvestaj.deleted_at.is_(None)).scalar()
+
+
+def roll_up(db: Session, since: Optional[date] = None, through: Optional[date] = None) -> int:
+    """Recompute the rollups of the days ``since`` (default: the last rolled-up day) through
+    ``through`` (default: yesterday) in one transaction; returns the number of days written."""
+    through = through or date.today() - timedelta(days=1)
+    since = since or rolled_up_through(db) or db.query(func.min(PAYMENT_DAY)).scalar()
+    if since is None or since > through:
+        return 0
+
+    totals = defaultdict(dict)
+    aggregates = (
+        db.query(PAYMENT_DAY, Uplata.tip, func.count(Uplata.uplataID), func.sum(Uplata.iznos))
+        .filter(
+            Uplata.datumUplate >= datetime.combine(since, datetime.min.time()),
+            Uplata.datumUplate < datetime.combine(through + timedelta(days=1), datetime.min.time())
+        )
+        .group_by(PAYMENT_DAY, Uplata.tip)
+    )
+    for day, tip, count, amount in aggregates:
+        totals[day][tip] = (count, amount)
+
+    now = datetime.utcnow()
+    days = [since + timedelta(days=offset) for offset in range((through - since).days + 1)]
+    # Empty days get a row too, so the last rolled-up day always advances
+    stmt = insert(Izvestaj).values([
+        {
+            "brojUplata": sum(count for count, _ in totals[day].values()),
+            "datumOd": day,
+            "datumDo": day,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for day in days
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Izvestaj.datumOd],
+        index_where=DAILY,
+        set_={"brojUplata": stmt.excluded.brojUplata, "updated_at": now, "deleted_at": None},
+    ).returning(Izvestaj.izvestajID, Izvestaj.datumOd)
+    izvestaj_ids = {row.datumOd: row.izvestajID for row in db.execute(stmt)}
+
+    # The upsert locks the day rows, so concurrent runs replace the lines one after another
+    db.query(IzvestajOglas).filter(
+        IzvestajOglas.izvestajID.in_(izvestaj_ids.values()), ROLLUP_LINE
+    ).delete(synchronize_session=False)
+    lines = [
+        {
+            "izvestajID": izvestaj_ids[day],
+            "tip": tip,
+            "datumUplate": day,
+            "brojUplata": count,
+            "iznos": amount,
+        }
+        for day in days
+        for tip, (count, amount) in totals[day].items()
+    ]
+    if lines:
+        db.execute(insert(IzvestajOglas).values(lines))
+    db.commit()
+    return len(days)
+
+
+def revenue_rows(
+    db: Session, start: Optional[date], end: Optional[date], tip: Optional[str] = None, by_day: bool = False
+) -> Iterator[Tuple[Optional[date], str, int, Decimal]]:
+    """(day, tip, count, sum) for the whole days ``start`` through ``end``: from the rollups for the
+    days they cover, from uplata after them. ``day`` is None unless ``by_day`` is set."""
+    through = rolled_up_through(db)
+    if through is not None and (start is None or start <= through):
+        days = [Izvestaj.datumOd] if by_day else []
+        rolled = (
+            db.query(*days, IzvestajOglas.tip, func.sum(IzvestajOglas.brojUplata), func.sum(IzvestajOglas.iznos))
+            .join(Izvestaj, Izvestaj.izvestajID == IzvestajOglas.izvestajID)
+            .filter(DAILY, ROLLUP_LINE, Izvestaj.deleted_at.is_(None), Izvestaj.datumOd <= min(end or through, through))
+        )
+        if start:
+            rolled = rolled.filter(Izvestaj.datumOd >= start)
+        if tip:
+            rolled = rolled.filter(IzvestajOglas.tip == tip)
+        for row in rolled.group_by(*days, IzvestajOglas.tip):
+            yield tuple(row) if by_day else (None, *row)
+
+    tail_start = through + timedelta(days=1) if through is not None else None
+    if start and (tail_start is None or start > tail_start):
+        tail_start = start
+    if end is None or tail_start is None or tail_start <= end:
+        days = [PAYMENT_DAY] if by_day else []
+        live = db.query(*days, Uplata.tip, func.count(Uplata.uplataID), func.sum(Uplata.iznos))
+        if tail_start:
+            live = live.filter(Uplata.datumUplate >= datetime.combine(tail_start, datetime.min.time()))
+        if end:
+            live = live.filter(Uplata.datumUplate <= datetime.combine(end, datetime.max.time()))
+        if tip:
+            live = live.filter(Uplata.tip == tip)
+        for row in live.group_by(*days, Uplata.tip):
+            yield tuple(row) if by_day else (None, *row)
+
+
+def revenue_by_tip(
+    db: Session, start: Optional[date] = None, end: Optional[date] = None, tip: Optional[str] = None
+) -> Dict[str, Tuple[int, Decimal]]:
+    """Payment count and sum per type for the whole days ``start`` through ``end``."""
+    totals: Dict[str, Tuple[int, Decimal]] = {}
+    for _, row_tip, count, amount in revenue_rows(db, start, end, tip):
+        previous_count, previous_amount = totals.get(row_tip, (0, Decimal(0)))
+        totals[row_tip] = (previous_count + int(count or 0), previous_amount + Decimal(amount or 0))
+    return totals
+
+
+def bucket_start(day: date, bucket: str) -> date:
+    """First day of the day, ISO week (Monday) or month containing ``day``."""
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start: date, bucket: str) -> date:
+    if bucket == "week":
+        return start + timedelta(days=7)
+    if bucket == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def revenue_series(db: Session, start: date, end: date, bucket: str) -> List[dict]:
+    """Featured-ad revenue and purchase volume per bucket from ``start``'s bucket through ``end``,
+    with empty buckets included."""
+    start = bucket_start(start, bucket)
+    points = {}
+    current = start
+    while current <= end:
+        points[current] = {
+            "bucket": current,
+            "featured_revenue": Decimal(0),
+            "featured_count": 0,
+            "purchase_volume": Decimal(0),
+            "purchase_count": 0,
+        }
+        current = next_bucket(current, bucket)
+
+    for day, tip, count, amount in revenue_rows(db, start, end, by_day=True):
+        point = points[bucket_start(day, bucket)]
+        if tip == 'featured_ad':
+            point["featured_revenue"] += Decimal(amount or 0)
+            point["featured_count"] += int(count or 0)
+        elif tip == 'kupovina':
+            point["purchase_volume"] += Decimal(amount or 0)
+            point["purchase_count"] += int(count or 0)
+    return list(points.values())
+
+
+def roll_up_now() -> int:
+    db = SessionLocal()
+    try:
+        return roll_up(db)
+    finally:
+        db.close()
+
+
+revenue_rollup_job = PeriodicJob("revenue rollup", roll_up_now, REVENUE_ROLLUP_INTERVAL)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Recompute the daily revenue rollups.")
+    parser.add_argument("--since", type=date.fromisoformat, help="first day to recompute (default: last rolled-up day)")
+    parser.add_argument("--through", type=date.fromisoformat, help="last day to recompute (default: yesterday)")
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        print(f"Rolled up {roll_up(session, args.since, args.through)} days")
+    finally:
+        session.close()
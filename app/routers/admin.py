@@ -1,26 +1,22 @@
-from datetime import datetime, date
-from typing import List, Optional
+from datetime import datetime, date, timedelta
+from typing import Dict, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import select
 
-from database import SessionLocal
-from schemas import User as SQLAlchemyUser, Uplata as SQLAlchemyUplata, Oglas as SQLAlchemyOglas
+from database import get_db, pool_status
+from schemas import User as SQLAlchemyUser, Uplata as SQLAlchemyUplata, Oglas as SQLAlchemyOglas, Vozilo as SQLAlchemyVozilo
 from pydantic_models import User
-from app.auth import get_current_user
+from auth import get_current_user, invalidate_user
+from cache import response_cache
+from exports import EXPORT_FORMAT_PATTERN, LISTING_COLUMNS, PAYMENT_COLUMNS, export_response
+from rollups import bucket_start, revenue_by_tip, revenue_series
+from pagination import NEXT_CURSOR_HEADER, count_total, keyset_paginate, next_cursor, set_total_headers
 
 router = APIRouter()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 def ensure_admin(current_user: SQLAlchemyUser = Depends(get_current_user)) -> SQLAlchemyUser:
     if current_user.tipKorisnika != 'admin':
         raise HTTPException(status_code=403, detail="Pristup dozvoljen samo administratorima")
@@ -64,17 +60,57 @@ class RevenueSummary(BaseModel):
     total_purchase_count: int
 
 
+class RevenuePoint(BaseModel):
+    bucket: date  # First day of the bucket
+    featured_revenue: float
+    featured_count: int
+    purchase_volume: float
+    purchase_count: int
+
+
+class RevenueSeries(BaseModel):
+    bucket: str
+    start_date: date
+    end_date: date
+    points: List[RevenuePoint]
+
+
 class ReportSummary(BaseModel):
     tip: str
     total_count: int
     total_amount: float
 
 
+class CacheStats(BaseModel):
+    backend: str
+    hits: int
+    misses: int
+    entries: Optional[int]
+    evictions: Optional[int]
+    invalidations: int
+
+
+class DbPoolStatus(BaseModel):
+    size: int
+    checked_out: int
+    checked_in: int
+    overflow: int
+    max_overflow: int
+    checkouts: int
+    timeouts: int
+    avg_wait_ms: float
+    max_wait_ms: float
+
+
 @router.get("/admin/users", response_model=List[User])
 def admin_list_users(
+    response: Response,
     skip: int = 0,
     limit: int = Query(100, le=500),
+    cursor: Optional[str] = None,
     include_deleted: bool = False,
+    total: bool = False,
+    exact: bool = False,
     db: Session = Depends(get_db),
     _: SQLAlchemyUser = Depends(ensure_admin)
 ):
@@ -83,14 +119,21 @@ def admin_list_users(
     # If not including deleted users, filter them out
     if not include_deleted:
         query = query.filter(SQLAlchemyUser.deleted_at.is_(None))
+
+    # exact=true forces a full COUNT(*) instead of an estimate for large totals
+    if total or exact:
+        set_total_headers(response, *count_total(db, query, exact=exact))
     
-    # Apply pagination
-    users = query.offset(skip).limit(limit).all()
+    # Apply pagination (cursor takes precedence over skip)
+    users = keyset_paginate(query, [SQLAlchemyUser.id], cursor, skip, limit, tag="admin_users")
+    cursor_out = next_cursor(users, limit, lambda user: [user.id], tag="admin_users")
+    if cursor_out:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_out
     return users
 
 
 @router.put("/admin/users/{user_id}", response_model=User)
-async def admin_update_user(
+def admin_update_user(
     user_id: int,
     user_update: UserUpdateAdmin,
     db: Session = Depends(get_db),
@@ -102,19 +145,26 @@ async def admin_update_user(
         raise HTTPException(status_code=404, detail="Korisnik nije pronađen")
     
     # Update only the provided fields
+    old_email = user.email
     update_data = user_update.model_dump(exclude_unset=True)
+    new_email = update_data.get("email")
+    if new_email and new_email != old_email and db.query(SQLAlchemyUser.id).filter(
+        SQLAlchemyUser.email == new_email
+    ).first():
+        raise HTTPException(status_code=400, detail="Email je već u upotrebi")
     for field, value in update_data.items():
         setattr(user, field, value)
     
     user.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(user)
+    invalidate_user(old_email, user.email)
     
     return user
 
 
 @router.post("/admin/users/{user_id}/restore", response_model=User)
-async def admin_restore_user(
+def admin_restore_user(
     user_id: int,
     db: Session = Depends(get_db),
     _: SQLAlchemyUser = Depends(ensure_admin)
@@ -131,10 +181,17 @@ async def admin_restore_user(
     user.deleted_at = None
     db.commit()
     db.refresh(user)
+    invalidate_user(user.email)
     
     return user
 
 
+# Range shown when start_date is omitted, and the limit on points per request
+SERIES_DEFAULT_SPAN = {"day": timedelta(days=29), "week": timedelta(weeks=11), "month": timedelta(days=334)}
+SERIES_BUCKET_DAYS = {"day": 1, "week": 7, "month": 28}
+SERIES_MAX_POINTS = 1000
+
+
 def parse_date(value: Optional[str]) -> Optional[date]:
     if not value:
         return None
@@ -144,28 +201,91 @@ def parse_date(value: Optional[str]) -> Optional[date]:
         raise HTTPException(status_code=400, detail=f"Neispravan format datuma: {value}")
 
 
+def payment_filters(start_date: Optional[str], end_date: Optional[str], tip: Optional[str]) -> list:
+    """Conditions shared by the payment lists and exports."""
+    start = parse_date(start_date)
+    end = parse_date(end_date)
+    filters = []
+    if start:
+        filters.append(SQLAlchemyUplata.datumUplate >= datetime.combine(start, datetime.min.time()))
+    if end:
+        filters.append(SQLAlchemyUplata.datumUplate <= datetime.combine(end, datetime.max.time()))
+    if tip:
+        filters.append(SQLAlchemyUplata.tip == tip)
+    return filters
+
+
+def paginate_payments(query, response: Response, skip: int, limit: int, cursor: Optional[str], tag: str):
+    """One page of payments, newest first, keyed on (datumUplate, uplataID)."""
+    columns = [SQLAlchemyUplata.datumUplate, SQLAlchemyUplata.uplataID]
+    payments = keyset_paginate(query, columns, cursor, skip, limit, tag=tag, descending=True)
+    cursor_out = next_cursor(payments, limit, lambda p: [p.datumUplate, p.uplataID], tag=tag)
+    if cursor_out:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_out
+    return payments
+
+
 @router.get("/admin/payments", response_model=List[PaymentDTO])
 def admin_list_payments(
+    response: Response,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     tip: Optional[str] = None,
+    skip: int = 0,
+    limit: int = Query(100, le=500),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     _: SQLAlchemyUser = Depends(ensure_admin)
 ):
-    query = db.query(SQLAlchemyUplata)
+    query = db.query(SQLAlchemyUplata).filter(*payment_filters(start_date, end_date, tip))
+    payments = paginate_payments(query, response, skip, limit, cursor, tag="admin_payments")
+    return [PaymentDTO.model_validate(p) for p in payments]
 
-    start = parse_date(start_date)
-    end = parse_date(end_date)
 
-    if start:
-        query = query.filter(SQLAlchemyUplata.datumUplate >= datetime.combine(start, datetime.min.time()))
-    if end:
-        query = query.filter(SQLAlchemyUplata.datumUplate <= datetime.combine(end, datetime.max.time()))
-    if tip:
-        query = query.filter(SQLAlchemyUplata.tip == tip)
+@router.get("/admin/payments/export")
+def admin_export_payments(
+    format: str = Query("csv", pattern=EXPORT_FORMAT_PATTERN),
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    tip: Optional[str] = None,
+    _: SQLAlchemyUser = Depends(ensure_admin)
+):
+    """All payments matching the filters as a streamed CSV or NDJSON file."""
+    statement = (
+        select(*PAYMENT_COLUMNS)
+        .where(*payment_filters(start_date, end_date, tip))
+        .order_by(SQLAlchemyUplata.datumUplate.desc())
+    )
+    return export_response(statement, format, "uplate")
 
-    payments = query.order_by(SQLAlchemyUplata.datumUplate.desc()).all()
-    return [PaymentDTO.model_validate(p) for p in payments]
+
+@router.get("/admin/oglasi/export")
+def admin_export_oglasi(
+    format: str = Query("csv", pattern=EXPORT_FORMAT_PATTERN),
+    statusOglasa: Optional[str] = None,
+    _: SQLAlchemyUser = Depends(ensure_admin)
+):
+    """All ads with their vehicles as a streamed CSV or NDJSON file."""
+    statement = (
+        select(*LISTING_COLUMNS)
+        .join(SQLAlchemyVozilo, SQLAlchemyOglas.voziloID == SQLAlchemyVozilo.voziloID)
+        .order_by(SQLAlchemyOglas.oglasID)
+    )
+    if statusOglasa:
+        statement = statement.where(SQLAlchemyOglas.statusOglasa == statusOglasa)
+    return export_response(statement, format, "oglasi")
+
+
+@router.get("/admin/cache", response_model=CacheStats)
+def admin_cache_stats(_: SQLAlchemyUser = Depends(ensure_admin)):
+    """Hit/miss counters of the response cache (per worker for the in-process backend)."""
+    return response_cache.stats()
+
+
+@router.get("/admin/db-pool", response_model=Dict[str, DbPoolStatus])
+def admin_db_pool_status(_: SQLAlchemyUser = Depends(ensure_admin)):
+    """Connection pool occupancy and checkout wait times of this worker, per engine (sync, async)."""
+    return pool_status()
 
 
 @router.get("/admin/revenue", response_model=RevenueSummary)
@@ -175,32 +295,12 @@ def admin_revenue_summary(
     db: Session = Depends(get_db),
     _: SQLAlchemyUser = Depends(ensure_admin)
 ):
-    start = parse_date(start_date)
-    end = parse_date(end_date)
-
-    def date_filters(query):
-        if start:
-            query = query.filter(SQLAlchemyUplata.datumUplate >= datetime.combine(start, datetime.min.time()))
-        if end:
-            query = query.filter(SQLAlchemyUplata.datumUplate <= datetime.combine(end, datetime.max.time()))
-        return query
+    # Daily rollups plus the payments made since the last rollup, see rollups.py
+    totals = revenue_by_tip(db, parse_date(start_date), parse_date(end_date))
 
     # Featured revenue (site profit)
-    featured_query = date_filters(
-        db.query(
-            func.coalesce(func.sum(SQLAlchemyUplata.iznos), 0),
-            func.count(SQLAlchemyUplata.uplataID)
-        ).filter(SQLAlchemyUplata.tip == 'featured_ad')
-    )
-    featured_sum, featured_count = featured_query.one()
-
-    purchase_query = date_filters(
-        db.query(
-            func.coalesce(func.sum(SQLAlchemyUplata.iznos), 0),
-            func.count(SQLAlchemyUplata.uplataID)
-        ).filter(SQLAlchemyUplata.tip == 'kupovina')
-    )
-    purchase_sum, purchase_count = purchase_query.one()
+    featured_count, featured_sum = totals.get('featured_ad', (0, 0))
+    purchase_count, purchase_sum = totals.get('kupovina', (0, 0))
 
     return RevenueSummary(
         total_featured_revenue=float(featured_sum or 0),
@@ -210,40 +310,47 @@ def admin_revenue_summary(
     )
 
 
-@router.get("/admin/reports", response_model=List[ReportSummary])
-def admin_reports(
+@router.get("/admin/revenue/series", response_model=RevenueSeries)
+def admin_revenue_series(
+    bucket: str = Query("day", pattern="^(day|week|month)$"),
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    tip: Optional[str] = None,
     db: Session = Depends(get_db),
     _: SQLAlchemyUser = Depends(ensure_admin)
 ):
-    start = parse_date(start_date)
-    end = parse_date(end_date)
-
-    query = db.query(
-        SQLAlchemyUplata.tip,
-        func.count(SQLAlchemyUplata.uplataID).label('total_count'),
-        func.coalesce(func.sum(SQLAlchemyUplata.iznos), 0).label('total_amount')
+    """Revenue per day, week or month; the first bucket starts on or before start_date."""
+    end = parse_date(end_date) or date.today()
+    start = bucket_start(parse_date(start_date) or end - SERIES_DEFAULT_SPAN[bucket], bucket)
+    if start > end:
+        raise HTTPException(status_code=400, detail="Datum od mora biti pre datuma do")
+    if (end - start).days // SERIES_BUCKET_DAYS[bucket] >= SERIES_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"Najviše {SERIES_MAX_POINTS} intervala po zahtevu")
+
+    return RevenueSeries(
+        bucket=bucket,
+        start_date=start,
+        end_date=end,
+        points=revenue_series(db, start, end, bucket)
     )
 
-    if tip:
-        query = query.filter(SQLAlchemyUplata.tip == tip)
 
-    if start:
-        query = query.filter(SQLAlchemyUplata.datumUplate >= datetime.combine(start, datetime.min.time()))
-    if end:
-        query = query.filter(SQLAlchemyUplata.datumUplate <= datetime.combine(end, datetime.max.time()))
-
-    results = query.group_by(SQLAlchemyUplata.tip).all()
+@router.get("/admin/reports", response_model=List[ReportSummary])
+def admin_reports(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    tip: Optional[str] = None,
+    db: Session = Depends(get_db),
+    _: SQLAlchemyUser = Depends(ensure_admin)
+):
+    totals = revenue_by_tip(db, parse_date(start_date), parse_date(end_date), tip)
 
     return [
         ReportSummary(
-            tip=row.tip,
-            total_count=row.total_count,
-            total_amount=float(row.total_amount or 0)
+            tip=row_tip,
+            total_count=count,
+            total_amount=float(amount or 0)
         )
-        for row in results
+        for row_tip, (count, amount) in sorted(totals.items())
     ]
 
 
@@ -263,23 +370,36 @@ class UserPaymentDTO(BaseModel):
 
 @router.get("/payments/my", response_model=List[UserPaymentDTO])
 def my_payments(
+    response: Response,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     tip: Optional[str] = None,
+    skip: int = 0,
+    limit: int = Query(100, le=500),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: SQLAlchemyUser = Depends(get_current_user)
 ):
-    query = db.query(SQLAlchemyUplata).filter(SQLAlchemyUplata.fromUserID == current_user.id)
+    query = db.query(SQLAlchemyUplata).filter(
+        SQLAlchemyUplata.fromUserID == current_user.id,
+        *payment_filters(start_date, end_date, tip)
+    )
+    payments = paginate_payments(query, response, skip, limit, cursor, tag="my_payments")
+    return [UserPaymentDTO.model_validate(p) for p in payments]
 
-    start = parse_date(start_date)
-    end = parse_date(end_date)
 
-    if start:
-        query = query.filter(SQLAlchemyUplata.datumUplate >= datetime.combine(start, datetime.min.time()))
-    if end:
-        query = query.filter(SQLAlchemyUplata.datumUplate <= datetime.combine(end, datetime.max.time()))
-    if tip:
-        query = query.filter(SQLAlchemyUplata.tip == tip)
-
-    payments = query.order_by(SQLAlchemyUplata.datumUplate.desc()).all()
-    return [UserPaymentDTO.model_validate(p) for p in payments]
+@router.get("/payments/my/export")
+def my_payments_export(
+    format: str = Query("csv", pattern=EXPORT_FORMAT_PATTERN),
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    tip: Optional[str] = None,
+    current_user: SQLAlchemyUser = Depends(get_current_user)
+):
+    """The current user's payments as a streamed CSV or NDJSON file."""
+    statement = (
+        select(*PAYMENT_COLUMNS)
+        .where(SQLAlchemyUplata.fromUserID == current_user.id, *payment_filters(start_date, end_date, tip))
+        .order_by(SQLAlchemyUplata.datumUplate.desc())
+    )
+    return export_response(statement, format, "moje-uplate")
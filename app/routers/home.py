@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Request, Response
+
+from etags import SHORT_LIVED, conditional_get
+from pydantic_models import HomeSnapshot
+from snapshot import home_snapshot
+
+router = APIRouter()
+
+
+@router.get("/home/snapshot", response_model=HomeSnapshot)
+def read_home_snapshot(request: Request, response: Response):
+    """Featured vehicles, newest listings and headline counts in one precomputed document."""
+    body, etag = home_snapshot.current()
+    not_modified = conditional_get(request, response, etag, SHORT_LIVED)
+    if not_modified:
+        return not_modified
+    return Response(content=body, media_type="application/json", headers=dict(response.headers))
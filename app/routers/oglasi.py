@@ -1,23 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.orm import Session, contains_eager, joinedload
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
 from schemas import Oglas as SQLAlchemyOglas, Uplata, User, Vozilo as SQLAlchemyVozilo
-from database import SessionLocal
+from database import get_async_db, get_db
 from pydantic_models import Oglas, OglasCreate, OglasUpdate, Vozilo
 from datetime import datetime, date, timedelta
 from typing import Optional
-from app.auth import get_current_user
+from auth import get_current_user
 from pydantic import BaseModel
+from cache import cached_response_async, invalidate
+from etags import SHORT_LIVED, conditional_get, make_etag
+from exports import EXPORT_FORMAT_PATTERN, LISTING_COLUMNS, export_response
+from facets import mark_sold
+from pagination import NEXT_CURSOR_HEADER, count_total, keyset_paginate, next_cursor, set_total_headers
 
 router = APIRouter()
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+
+async def fetch_all(db: AsyncSession, statement) -> list:
+    return (await db.execute(statement)).scalars().all()
+
+
+def invalidate_oglas(voziloID: Optional[int]) -> None:
+    """Drop cached ad lists and the vehicle pages that show this ad's status."""
+    invalidate("oglasi", "vozila", f"vozilo:{voziloID}")
+
+
+def sync_sold(db: Session, oglas: SQLAlchemyOglas) -> None:
+    """Keep the vehicle's sold flag and the facet counts in line with the ad's status."""
+    if oglas.vozilo is not None:
+        mark_sold(db, oglas.vozilo, oglas.statusOglasa == 'prodat')
 
 
 class MyAdResponse(BaseModel):
@@ -29,9 +43,15 @@ class MyAdResponse(BaseModel):
 
 @router.post("/oglasi/", response_model=Oglas)
 def create_oglas(oglas: OglasCreate, db: Session = Depends(get_db)):
+    existing = db.query(SQLAlchemyOglas.oglasID).filter(SQLAlchemyOglas.voziloID == oglas.voziloID).first()
+    if existing:
+        raise HTTPException(status_code=400, detail="Vozilo već ima oglas")
     db_oglas = SQLAlchemyOglas(**oglas.model_dump())
     db.add(db_oglas)
+    db.flush()
+    sync_sold(db, db_oglas)
     db.commit()
+    invalidate_oglas(db_oglas.voziloID)
     db.refresh(db_oglas)
     return db_oglas
 
@@ -74,41 +94,46 @@ def read_oglas_with_vehicle(
     )
 
 @router.get("/oglasi/", response_model=list[Oglas])
-def read_oglasi(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    oglasi = (
-        db.query(SQLAlchemyOglas)
-        .filter(SQLAlchemyOglas.statusOglasa != 'prodat')
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
+def read_oglasi(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    total: bool = False,
+    db: Session = Depends(get_db)
+):
+    query = db.query(SQLAlchemyOglas).filter(SQLAlchemyOglas.statusOglasa != 'prodat')
+    if total:
+        set_total_headers(response, *count_total(db, query))
+    oglasi = keyset_paginate(query, [SQLAlchemyOglas.oglasID], cursor, skip, limit, tag="oglasi")
+    cursor_out = next_cursor(oglasi, limit, lambda oglas: [oglas.oglasID], tag="oglasi")
+    if cursor_out:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_out
     return oglasi
 
 @router.get("/oglasi/active/", response_model=list[Oglas])
-def read_active_oglasi(db: Session = Depends(get_db)):
-    oglasi = db.query(SQLAlchemyOglas).filter(
-        SQLAlchemyOglas.statusOglasa.in_(['standardniOglas', 'istaknutiOglas']),
-        SQLAlchemyOglas.datumIsteka >= db.func.current_date()
-    ).all()
-    return oglasi
+async def read_active_oglasi(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    # Expired ads are moved out of these statuses by the expiry job
+    active = select(SQLAlchemyOglas).where(
+        SQLAlchemyOglas.statusOglasa.in_(['standardniOglas', 'istaknutiOglas'])
+    )
+    return await cached_response_async(
+        request, response, list[Oglas], ["oglasi"], lambda: fetch_all(db, active)
+    )
 
 @router.get("/oglasi/my/active", response_model=list[MyAdResponse])
 def read_my_active_oglasi(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    today = date.today()
     active_statuses = ['standardniOglas', 'istaknutiOglas', 'aktivan']
     oglasi = (
         db.query(SQLAlchemyOglas)
-        .join(SQLAlchemyVozilo, SQLAlchemyOglas.voziloID == SQLAlchemyVozilo.voziloID)
+        .join(SQLAlchemyOglas.vozilo)
+        .options(contains_eager(SQLAlchemyOglas.vozilo))
         .filter(
             SQLAlchemyOglas.korisnikID == current_user.id,
-            SQLAlchemyOglas.statusOglasa.in_(active_statuses),
-            or_(
-                SQLAlchemyOglas.datumIsteka == None,
-                SQLAlchemyOglas.datumIsteka >= today
-            )
+            SQLAlchemyOglas.statusOglasa.in_(active_statuses)
         )
         .all()
     )
@@ -129,7 +154,8 @@ def read_my_sold_oglasi(
 ):
     oglasi = (
         db.query(SQLAlchemyOglas)
-        .join(SQLAlchemyVozilo, SQLAlchemyOglas.voziloID == SQLAlchemyVozilo.voziloID)
+        .join(SQLAlchemyOglas.vozilo)
+        .options(contains_eager(SQLAlchemyOglas.vozilo))
         .filter(
             SQLAlchemyOglas.statusOglasa == 'prodat',
             SQLAlchemyOglas.korisnikID == current_user.id
@@ -145,34 +171,82 @@ def read_my_sold_oglasi(
         for oglas in oglasi
     ]
 
+@router.get("/oglasi/my/export")
+def export_my_oglasi(
+    format: str = Query("csv", pattern=EXPORT_FORMAT_PATTERN),
+    current_user: User = Depends(get_current_user)
+):
+    """All of the current user's ads with their vehicles as a streamed CSV or NDJSON file."""
+    statement = (
+        select(*LISTING_COLUMNS)
+        .join(SQLAlchemyVozilo, SQLAlchemyOglas.voziloID == SQLAlchemyVozilo.voziloID)
+        .where(SQLAlchemyOglas.korisnikID == current_user.id)
+        .order_by(SQLAlchemyOglas.oglasID)
+    )
+    return export_response(statement, format, "moji-oglasi")
+
 @router.put("/oglasi/{oglas_id}", response_model=Oglas)
 def update_oglas(oglas_id: int, updated_oglas: OglasUpdate, db: Session = Depends(get_db)):
-    oglas = db.query(SQLAlchemyOglas).filter(SQLAlchemyOglas.oglasID == oglas_id).first()
+    oglas = (
+        db.query(SQLAlchemyOglas)
+        .options(joinedload(SQLAlchemyOglas.vozilo))
+        .filter(SQLAlchemyOglas.oglasID == oglas_id)
+        .first()
+    )
     if oglas is None:
         raise HTTPException(status_code=404, detail="Advertisement not found")
+    previous = oglas.vozilo
     for field, value in updated_oglas.model_dump().items():
         setattr(oglas, field, value)
+    moved = previous is not None and previous.voziloID != oglas.voziloID
+    if moved:
+        # The ad moved to another vehicle; the old one is no longer sold through it
+        with db.no_autoflush:
+            vozilo = db.get(SQLAlchemyVozilo, oglas.voziloID)
+        if vozilo is None:
+            raise HTTPException(status_code=404, detail="Vehicle not found")
+        mark_sold(db, previous, False)
+        oglas.vozilo = vozilo
+    sync_sold(db, oglas)
     db.commit()
+    if moved:
+        invalidate_oglas(previous.voziloID)
+    invalidate_oglas(oglas.voziloID)
     db.refresh(oglas)
     return oglas
 
 @router.delete("/oglasi/{oglas_id}")
 def delete_oglas(oglas_id: int, db: Session = Depends(get_db)):
-    oglas = db.query(SQLAlchemyOglas).filter(SQLAlchemyOglas.oglasID == oglas_id).first()
+    oglas = (
+        db.query(SQLAlchemyOglas)
+        .options(joinedload(SQLAlchemyOglas.vozilo))
+        .filter(SQLAlchemyOglas.oglasID == oglas_id)
+        .first()
+    )
     if oglas is None:
         raise HTTPException(status_code=404, detail="Advertisement not found")
+    voziloID = oglas.voziloID
+    if oglas.vozilo is not None:
+        # Without its ad the vehicle is back in the catalog and the facet counts
+        mark_sold(db, oglas.vozilo, False)
     db.delete(oglas)
     db.commit()
+    invalidate_oglas(voziloID)
     return {"message": "Advertisement deleted successfully"}
 
 @router.post("/oglasi/{oglas_id}/feature", response_model=Oglas)
-async def feature_oglas(
+def feature_oglas(
     oglas_id: int, 
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)  # You'll need to implement this dependency
 ):
     # Get the ad
-    oglas = db.query(SQLAlchemyOglas).filter(SQLAlchemyOglas.oglasID == oglas_id).first()
+    oglas = (
+        db.query(SQLAlchemyOglas)
+        .options(joinedload(SQLAlchemyOglas.vozilo))
+        .filter(SQLAlchemyOglas.oglasID == oglas_id)
+        .first()
+    )
     if not oglas:
         raise HTTPException(status_code=404, detail="Advertisement not found")
     
@@ -204,23 +278,31 @@ async def feature_oglas(
     oglas.cenaIstaknutogOglasa = 30.00
     oglas.datumIsteka = expiration_date
     oglas.updated_at = datetime.now()
+    sync_sold(db, oglas)
     
     # Save changes
     db.add(payment)
     db.add(oglas)
     db.commit()
+    invalidate_oglas(oglas.voziloID)
     db.refresh(oglas)
     
     return oglas
 
 @router.get("/oglasi/featured/", response_model=list[Oglas])
-def get_featured_oglasi(db: Session = Depends(get_db)):
+async def get_featured_oglasi(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
     """Get all currently featured ads"""
-    today = date.today()
-    return db.query(SQLAlchemyOglas).filter(
-        SQLAlchemyOglas.statusOglasa == 'istaknutiOglas',
-        SQLAlchemyOglas.datumIsteka >= today
-    ).all()
+    featured = select(SQLAlchemyOglas).where(
+        SQLAlchemyOglas.statusOglasa == 'istaknutiOglas'
+    ).order_by(SQLAlchemyOglas.oglasID)
+    versions = await db.execute(featured.with_only_columns(SQLAlchemyOglas.oglasID, SQLAlchemyOglas.verzija))
+    etag = make_etag("featured", [tuple(version) for version in versions])
+    not_modified = conditional_get(request, response, etag, SHORT_LIVED)
+    if not_modified:
+        return not_modified
+    return await cached_response_async(
+        request, response, list[Oglas], ["oglasi"], lambda: fetch_all(db, featured)
+    )
 
 
 @router.post("/oglasi/{oglas_id}/purchase", response_model=Oglas)
@@ -231,7 +313,8 @@ def purchase_oglas(
 ):
     oglas = (
         db.query(SQLAlchemyOglas)
-        .join(SQLAlchemyVozilo, SQLAlchemyOglas.voziloID == SQLAlchemyVozilo.voziloID)
+        .join(SQLAlchemyOglas.vozilo)
+        .options(contains_eager(SQLAlchemyOglas.vozilo))
         .filter(SQLAlchemyOglas.oglasID == oglas_id)
         .first()
     )
@@ -268,10 +351,16 @@ def purchase_oglas(
         )
 
         db.add(payment)
+        sync_sold(db, oglas)
         db.commit()
+        invalidate_oglas(oglas.voziloID)
         db.refresh(oglas)
         return oglas
 
+    except StaleDataError:
+        # Answered with 409 by the handler in main.py
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Greška prilikom obrade kupovine: {str(e)}")
@@ -285,7 +374,8 @@ def get_sold_oglas_detail(
 ):
     oglas = (
         db.query(SQLAlchemyOglas)
-        .join(SQLAlchemyVozilo, SQLAlchemyOglas.voziloID == SQLAlchemyVozilo.voziloID)
+        .join(SQLAlchemyOglas.vozilo)
+        .options(contains_eager(SQLAlchemyOglas.vozilo))
         .filter(SQLAlchemyOglas.oglasID == oglas_id)
         .first()
     )
@@ -309,11 +399,11 @@ def get_sold_oglasi(db: Session = Depends(get_db)):
     ).all()
 
 @router.get("/oglasi/vozilo/{vozilo_id}/status")
-async def get_vozilo_ad_status(vozilo_id: int, db: Session = Depends(get_db)):
+async def get_vozilo_ad_status(vozilo_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get the status of an ad for a specific vehicle"""
-    oglas = db.query(SQLAlchemyOglas).filter(
-        SQLAlchemyOglas.voziloID == vozilo_id
-    ).first()
+    oglas = (await db.execute(
+        select(SQLAlchemyOglas).where(SQLAlchemyOglas.voziloID == vozilo_id).limit(1)
+    )).scalars().first()
     
     if not oglas:
         return {
@@ -322,10 +412,7 @@ async def get_vozilo_ad_status(vozilo_id: int, db: Session = Depends(get_db)):
             "message": "No ad found for this vehicle"
         }
     
-    is_active = (
-        oglas.statusOglasa in ['standardniOglas', 'istaknutiOglas'] and
-        oglas.datumIsteka >= date.today()
-    )
+    is_active = oglas.statusOglasa in ['standardniOglas', 'istaknutiOglas']
     
     return {
         "has_active_ad": is_active,
@@ -1,29 +1,27 @@
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from schemas import User as SQLAlchemyUser
-from database import SessionLocal
+from database import get_async_db, get_db
 from pydantic_models import User, UserCreate, UserUpdate, UserLogin, UserRegister, Token
 from auth import (
     authenticate_user,
     create_access_token,
     get_current_active_user,
     get_password_hash,
+    invalidate_user,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
 from datetime import timedelta
+from typing import Optional
+from passwords import run_hashing
+from pagination import NEXT_CURSOR_HEADER, count_total, keyset_paginate, next_cursor, set_total_headers
 
 router = APIRouter()
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/users/", response_model=User)
 def create_user(user: UserCreate, db: Session = Depends(get_db)):
     db_user = SQLAlchemyUser(**user.model_dump())
@@ -40,8 +38,21 @@ def read_user(user_id: int, db: Session = Depends(get_db)):
     return user
 
 @router.get("/users/", response_model=list[User])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    users = db.query(SQLAlchemyUser).offset(skip).limit(limit).all()
+def read_users(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    total: bool = False,
+    db: Session = Depends(get_db)
+):
+    query = db.query(SQLAlchemyUser)
+    if total:
+        set_total_headers(response, *count_total(db, query))
+    users = keyset_paginate(query, [SQLAlchemyUser.id], cursor, skip, limit, tag="users")
+    cursor_out = next_cursor(users, limit, lambda user: [user.id], tag="users")
+    if cursor_out:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_out
     return users
 
 @router.put("/users/{user_id}", response_model=User)
@@ -49,10 +60,16 @@ def update_user(user_id: int, updated_user: UserUpdate, db: Session = Depends(ge
     user = db.query(SQLAlchemyUser).filter(SQLAlchemyUser.id == user_id).first()
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
+    if updated_user.email != user.email and db.query(SQLAlchemyUser.id).filter(
+        SQLAlchemyUser.email == updated_user.email
+    ).first():
+        raise HTTPException(status_code=400, detail="Email already registered")
+    old_email = user.email
     for field, value in updated_user.model_dump().items():
         setattr(user, field, value)
     db.commit()
     db.refresh(user)
+    invalidate_user(old_email, user.email)
     return user
 
 @router.delete("/users/{user_id}", response_model=User)
@@ -83,14 +100,17 @@ def delete_user(
     user.deleted_at = datetime.utcnow()
     db.commit()
     db.refresh(user)
+    invalidate_user(user.email)
     
     return user
 
 # Auth routes
 @router.post("/auth/login", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_for_access_token(
+    form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)
+):
     """Login endpoint that returns JWT token."""
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -104,21 +124,25 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/auth/register", response_model=User)
-def register_user(user: UserRegister, db: Session = Depends(get_db)):
+async def register_user(user: UserRegister, db: AsyncSession = Depends(get_async_db)):
     """Register a new user."""
     try:
         # Check if user already exists
-        db_user = db.query(SQLAlchemyUser).filter(SQLAlchemyUser.email == user.email).first()
+        db_user = (await db.execute(
+            select(SQLAlchemyUser).where(SQLAlchemyUser.email == user.email)
+        )).scalars().first()
         if db_user:
             raise HTTPException(status_code=400, detail="Email already registered")
 
         # Check if username already exists
-        db_user = db.query(SQLAlchemyUser).filter(SQLAlchemyUser.korisnickoIme == user.korisnickoIme).first()
+        db_user = (await db.execute(
+            select(SQLAlchemyUser).where(SQLAlchemyUser.korisnickoIme == user.korisnickoIme)
+        )).scalars().first()
         if db_user:
             raise HTTPException(status_code=400, detail="Username already taken")
 
         # Create new user
-        hashed_password = get_password_hash(user.lozinka)
+        hashed_password = await run_hashing(get_password_hash, user.lozinka)
         db_user = SQLAlchemyUser(
             korisnickoIme=user.korisnickoIme,
             email=user.email,
@@ -129,11 +153,11 @@ def register_user(user: UserRegister, db: Session = Depends(get_db)):
             updated_at=datetime.utcnow()
         )
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
         return db_user
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Registration error: {str(e)}")
         print(f"Error type: {type(e).__name__}")
         print(f"User data: {user.dict()}")
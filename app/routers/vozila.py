@@ -2,13 +2,32 @@ import os
 import shutil
 from datetime import datetime, date, timedelta
 from pathlib import Path
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, status
+from uuid import uuid4
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from schemas import Vozilo as SQLAlchemyVozilo, User as SQLAlchemyUser, Oglas
-from database import SessionLocal
-from pydantic_models import Vozilo, VoziloCreate, VoziloUpdate, User
-from typing import List, Optional
-from app.auth import get_current_user as auth_get_current_user
+from schemas import Vozilo as SQLAlchemyVozilo, VoziloSlika as SQLAlchemyVoziloSlika, User as SQLAlchemyUser, Oglas
+from database import get_async_db, get_db
+from pydantic_models import BulkImportResult, FacetValue, Vozilo, VoziloCreate, VoziloSlika, VoziloUpdate, User, KILOMETRAZA_PATTERN, parse_kilometraza
+from typing import Dict, List, Optional
+from cache import cached_response, cached_response_async, invalidate
+from etags import REVALIDATE, conditional_get, make_etag
+from facets import adjust_facets, count_facets, facet_values, stored_facets, stored_total
+from lokacije import resolve_grad
+from bulk_import import detect_format, import_vozila, iter_rows
+from images import build_slike, cover_images_async, parse_slike
+from filters import (
+    FEATURED_PIN_LIMIT,
+    NEWEST_ORDER,
+    CatalogOrder,
+    VoziloFilters,
+    annotate_vozila,
+    catalog_order,
+    unsold_vozila_query
+)
+from pagination import NEXT_CURSOR_HEADER, count_total, keyset_paginate, next_cursor, set_total_headers
+from auth import get_current_user as auth_get_current_user
 
 # Create uploads directory (match app.main mount)
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -17,23 +36,14 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 router = APIRouter()
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 def save_uploaded_files(files: List[UploadFile]) -> List[str]:
     """Save uploaded files and return their paths"""
     saved_paths = []
     
     for file in files:
-        # Create a unique filename
+        # Create a unique filename; the token keeps concurrent uploads of the same name apart
         timestamp = int(datetime.now().timestamp())
-        file_extension = os.path.splitext(file.filename)[1]
-        filename = f"{timestamp}_{file.filename}"
+        filename = f"{timestamp}_{uuid4().hex[:8]}_{os.path.basename(file.filename)}"
         file_path = UPLOAD_DIR / filename
 
         # Save the file
@@ -45,16 +55,25 @@ def save_uploaded_files(files: List[UploadFile]) -> List[str]:
     return saved_paths
 
 
+def remove_files(paths: List[str]) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
 # Use centralized auth from app.auth
 
+# Sync so the upload copies, image hashing and database work run in the threadpool, not on the event loop
 @router.post("/vozila/", response_model=Vozilo)
-async def create_vozilo(
+def create_vozilo(
     marka: str = Form(...),
     model: str = Form(...),
     godinaProizvodnje: int = Form(...),
     cena: float = Form(...),
     tipGoriva: str = Form(...),
-    kilometraza: str = Form(...),
+    kilometraza: str = Form(..., pattern=KILOMETRAZA_PATTERN),
     lokacija: str = Form(...),
     stanje: str = Form(...),
     kubikaza: int = Form(...),
@@ -69,6 +88,7 @@ async def create_vozilo(
     current_user: SQLAlchemyUser = Depends(auth_get_current_user),
     db: Session = Depends(get_db)
 ):
+    saved_paths = []
     try:
         # Save uploaded files
         saved_paths = save_uploaded_files(slike)
@@ -84,8 +104,11 @@ async def create_vozilo(
             cena=cena,
             tipGoriva=tipGoriva,
             kilometraza=kilometraza,
+            kilometrazaKm=parse_kilometraza(kilometraza),
             lokacija=lokacija,
+            gradID=resolve_grad(db, lokacija),
             slike=slike_paths,  # Store comma-separated paths
+            slikeVozila=build_slike(slike_paths.split(",")),
             stanje=stanje,
             kubikaza=kubikaza,
             opis=opis,
@@ -97,58 +120,89 @@ async def create_vozilo(
             euroNorma=euroNorma
         )
         
-        # Add the vehicle to the database
+        # The ad references the vehicle through the relationship, so one flush
+        # inserts both and a single commit creates them together or not at all
+        today = date.today()
+        db_oglas = Oglas(
+            datumKreiranja=today,
+            datumIsteka=today + timedelta(days=30),  # 30 days from now
+            vozilo=db_vozilo,
+            korisnikID=current_user.id,
+            statusOglasa='aktivan',
+            created_at=datetime.utcnow(),
+            updated_at=datetime.utcnow()
+        )
         db.add(db_vozilo)
-        
-        try:
-            # First commit the vehicle to get its ID
-            db.commit()
-            db.refresh(db_vozilo)
-            
-            # Now create the ad (oglas) record
-            today = date.today()
-            expiry_date = today + timedelta(days=30)  # 30 days from now
-            
-            db_oglas = Oglas(
-                datumKreiranja=today,
-                datumIsteka=expiry_date,
-                voziloID=db_vozilo.voziloID,
-                korisnikID=current_user.id,
-                statusOglasa='aktivan',
-                created_at=datetime.utcnow(),
-                updated_at=datetime.utcnow()
-            )
-            
-            # Add and commit the ad
-            db.add(db_oglas)
-            db.commit()
-            db.refresh(db_oglas)
-            
-            # Log the created ad for debugging
-            print(f"Created ad: ID={db_oglas.oglasID} for vehicle ID={db_oglas.voziloID} by user ID={db_oglas.korisnikID}")
-            
-            # Refresh the vehicle to include relationships
-            db.refresh(db_vozilo)
-            
-            return db_vozilo
-            
-        except Exception as e:
-            # Rollback in case of error
-            db.rollback()
-            print(f"Error in create_vozilo: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error creating vehicle ad: {str(e)}")
-        
+        db.add(db_oglas)
+        adjust_facets(db, facet_values(db_vozilo), 1)
+        db.flush()
+        oglas_id = db_oglas.oglasID
+        # Built from the flushed state; after the commit the instance is expired and would be reloaded
+        setattr(db_vozilo, 'naslovnaSlika', db_vozilo.slikeVozila[0].putanja if db_vozilo.slikeVozila else None)
+        created = Vozilo.model_validate(db_vozilo)
+        db.commit()
     except Exception as e:
         db.rollback()
-        raise HTTPException(status_code=500, detail=f"Error creating vehicle: {str(e)}")
+        remove_files(saved_paths)
+        print(f"Error in create_vozilo: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error creating vehicle ad: {str(e)}")
+
+    invalidate("vozila", "oglasi")
+    # Log the created ad for debugging
+    print(f"Created ad: ID={oglas_id} for vehicle ID={created.voziloID} by user ID={current_user.id}")
+    return created
+
+@router.post("/vozila/bulk", response_model=BulkImportResult)
+def bulk_import_vozila(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    current_user: SQLAlchemyUser = Depends(auth_get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Create vehicles with active ads from a CSV (with header) or NDJSON file of VoziloCreate rows."""
+    format = format or detect_format(file.filename, file.content_type)
+    if format is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Nepoznat format fajla; pošaljite .csv ili .ndjson fajl ili navedite ?format=csv|ndjson"
+        )
+    result = import_vozila(db, iter_rows(file.file, format), current_user.id)
+    if result.imported:
+        invalidate("vozila", "oglasi")
+    return result
+
+@router.get("/vozila/facets", response_model=Dict[str, List[FacetValue]])
+def read_vozila_facets(filters: VoziloFilters = Depends(), db: Session = Depends(get_db)):
+    """Per-value counts for the catalog facets under the given filters."""
+    if filters.is_empty():
+        return stored_facets(db)
+    return count_facets(filters.apply(unsold_vozila_query(db)))
 
 @router.get("/vozila/{vozilo_id}", response_model=Vozilo)
-def read_vozilo(vozilo_id: int, db: Session = Depends(get_db)):
-    vozilo = db.query(SQLAlchemyVozilo).filter(SQLAlchemyVozilo.voziloID == vozilo_id).first()
+async def read_vozilo(
+    vozilo_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)
+):
+    versions = (await db.execute(
+        select(SQLAlchemyVozilo.verzija, Oglas.oglasID, Oglas.verzija)
+        .outerjoin(Oglas, Oglas.voziloID == SQLAlchemyVozilo.voziloID)
+        .where(SQLAlchemyVozilo.voziloID == vozilo_id)
+        .limit(1)
+    )).first()
+    if versions is None:
+        raise HTTPException(status_code=404, detail="Vehicle not found")
+    not_modified = conditional_get(request, response, make_etag("vozilo", vozilo_id, *versions), REVALIDATE)
+    if not_modified:
+        return not_modified
+    return await cached_response_async(
+        request, response, Vozilo, [f"vozilo:{vozilo_id}"], lambda: load_vozilo(db, vozilo_id)
+    )
+
+async def load_vozilo(db: AsyncSession, vozilo_id: int):
+    vozilo = await db.get(SQLAlchemyVozilo, vozilo_id)
     if vozilo is None:
         raise HTTPException(status_code=404, detail="Vehicle not found")
 
-    oglas = db.query(Oglas).filter(Oglas.voziloID == vozilo_id).first()
+    oglas = (await db.execute(select(Oglas).where(Oglas.voziloID == vozilo_id).limit(1))).scalars().first()
 
     if oglas:
         is_featured = oglas.statusOglasa == 'istaknutiOglas'
@@ -156,55 +210,117 @@ def read_vozilo(vozilo_id: int, db: Session = Depends(get_db)):
         setattr(vozilo, 'istaknuto', is_featured)
         setattr(vozilo, 'statusOglasa', oglas.statusOglasa)
         setattr(vozilo, 'oglasID', oglas.oglasID)
+    setattr(vozilo, 'naslovnaSlika', (await cover_images_async(db, [vozilo_id])).get(vozilo_id))
 
     return vozilo
 
-@router.get("/vozila/", response_model=list[Vozilo])
-def read_vozila(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    results = (
-        db.query(SQLAlchemyVozilo, Oglas)
-        .outerjoin(Oglas, Oglas.voziloID == SQLAlchemyVozilo.voziloID)
-        .filter((Oglas.statusOglasa != 'prodat') | (Oglas.statusOglasa.is_(None)))
-        .offset(skip)
-        .limit(limit)
+@router.get("/vozila/{vozilo_id}/slike", response_model=List[VoziloSlika])
+def read_vozilo_slike(vozilo_id: int, db: Session = Depends(get_db)):
+    """All images of a vehicle with their metadata, cover first."""
+    return (
+        db.query(SQLAlchemyVoziloSlika)
+        .filter(SQLAlchemyVoziloSlika.voziloID == vozilo_id)
+        .order_by(SQLAlchemyVoziloSlika.pozicija)
         .all()
     )
 
-    vozila = []
-    for vozilo_row, oglas_row in results:
-        is_featured = bool(oglas_row and oglas_row.statusOglasa == 'istaknutiOglas')
-        setattr(vozilo_row, 'isFeatured', is_featured)
-        setattr(vozilo_row, 'istaknuto', is_featured)
-        if oglas_row is not None:
-            setattr(vozilo_row, 'statusOglasa', oglas_row.statusOglasa)
-            setattr(vozilo_row, 'oglasID', oglas_row.oglasID)
-        vozila.append(vozilo_row)
+def paginate_vozila(
+    db: Session,
+    query,
+    response: Response,
+    skip: int,
+    limit: int,
+    cursor: Optional[str],
+    order: CatalogOrder = NEWEST_ORDER,
+    pin_featured: bool = False
+):
+    """Return one page of (vehicle, ad) rows as vehicles annotated with their ad status.
+
+    With ``pin_featured`` the listing starts with up to FEATURED_PIN_LIMIT
+    featured vehicles, fetched in a separate small query. They count against
+    ``limit`` and are left out of the regular rows of every page, so each
+    vehicle appears once and ``skip`` offsets run over pinned and regular rows
+    alike. Cursors only ever point into the regular rows.
+    """
+    pinned = []
+    if pin_featured and limit > 1:
+        # At least one regular row per page, so the first page can hand out a cursor
+        pinned = keyset_paginate(
+            query.filter(Oglas.statusOglasa == 'istaknutiOglas'), order.columns, None, 0,
+            min(FEATURED_PIN_LIMIT, limit - 1), tag=order.tag, descending=order.descending
+        )
+        if pinned:
+            query = query.filter(SQLAlchemyVozilo.voziloID.notin_([row[0].voziloID for row in pinned]))
+
+    shown = [] if cursor else pinned[skip:skip + limit]
+    if not cursor:
+        skip = max(0, skip - len(pinned))
+    regular_limit = limit - len(shown)
+    results = keyset_paginate(
+        query, order.columns, cursor, skip, regular_limit, tag=order.tag, descending=order.descending
+    )
+    cursor_out = next_cursor(results, regular_limit, order.key, tag=order.tag)
+    if cursor_out:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_out
+
+    return annotate_vozila(db, shown + results)
+
+@router.get("/vozila/", response_model=list[Vozilo])
+def read_vozila(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    sort: Optional[str] = None,
+    pin_featured: bool = False,
+    total: bool = False,
+    db: Session = Depends(get_db)
+):
+    order = catalog_order(sort)
+
+    def build():
+        query = unsold_vozila_query(db)
+        if total:
+            set_total_headers(response, *count_total(db, query, summary=lambda: stored_total(db)))
+        return paginate_vozila(db, query, response, skip, limit, cursor, order, pin_featured)
 
-    return vozila
+    return cached_response(request, response, list[Vozilo], ["vozila"], build)
 
 @router.get("/vozila/search/", response_model=list[Vozilo])
 def search_vozila(
-    marka: str = None,
-    model: str = None,
-    min_cena: float = None,
-    max_cena: float = None,
+    response: Response,
+    filters: VoziloFilters = Depends(),
+    skip: int = 0,
+    limit: int = Query(100, le=500),
+    cursor: Optional[str] = None,
+    sort: Optional[str] = None,
+    pin_featured: bool = False,
+    total: bool = False,
     db: Session = Depends(get_db)
 ):
-    query = db.query(SQLAlchemyVozilo).outerjoin(Oglas, Oglas.voziloID == SQLAlchemyVozilo.voziloID)
-    query = query.filter((Oglas.statusOglasa != 'prodat') | (Oglas.statusOglasa.is_(None)))
-    if marka:
-        query = query.filter(SQLAlchemyVozilo.marka.ilike(f"%{marka}%"))
-    if model:
-        query = query.filter(SQLAlchemyVozilo.model.ilike(f"%{model}%"))
-    if min_cena:
-        query = query.filter(SQLAlchemyVozilo.cena >= min_cena)
-    if max_cena:
-        query = query.filter(SQLAlchemyVozilo.cena <= max_cena)
-    return query.all()
+    query = filters.apply(unsold_vozila_query(db))
+    if total:
+        summary = (lambda: stored_total(db)) if filters.is_empty() else None
+        set_total_headers(response, *count_total(db, query, summary=summary))
+    order = catalog_order(sort, filters)
+    if order.tag == "relevance":
+        query = query.add_columns(order.columns[0].label("rank"))
+    return paginate_vozila(db, query, response, skip, limit, cursor, order, pin_featured)
 
 @router.get("/vozila/{vozilo_id}/ad-status", response_model=dict)
-def get_ad_status(vozilo_id: int, db: Session = Depends(get_db)):
-    oglas = db.query(Oglas).filter(Oglas.voziloID == vozilo_id).first()
+async def get_ad_status(
+    vozilo_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)
+):
+    version = (await db.execute(
+        select(Oglas.oglasID, Oglas.verzija).where(Oglas.voziloID == vozilo_id).limit(1)
+    )).first()
+    etag = make_etag("ad-status", vozilo_id, *(version or ()))
+    not_modified = conditional_get(request, response, etag, REVALIDATE)
+    if not_modified:
+        return not_modified
+
+    oglas = (await db.execute(select(Oglas).where(Oglas.voziloID == vozilo_id).limit(1))).scalars().first()
 
     if not oglas:
         return {
@@ -213,11 +329,7 @@ def get_ad_status(vozilo_id: int, db: Session = Depends(get_db)):
             "message": "No ad found for this vehicle"
         }
 
-    today = date.today()
-    is_active = (
-        oglas.statusOglasa in ['standardniOglas', 'istaknutiOglas'] and
-        oglas.datumIsteka and oglas.datumIsteka >= today
-    )
+    is_active = oglas.statusOglasa in ['standardniOglas', 'istaknutiOglas']
 
     is_sold = oglas.statusOglasa == 'prodat'
     sale_date = oglas.datumProdaje.isoformat() if oglas.datumProdaje else None
@@ -243,9 +355,24 @@ def update_vozilo(vozilo_id: int, updated_vozilo: VoziloUpdate, db: Session = De
     if oglas and oglas.statusOglasa == 'prodat':
         raise HTTPException(status_code=400, detail="Cannot modify sold vehicle")
 
+    old_facets = facet_values(vozilo)
+    old_slike = vozilo.slike
+    old_lokacija = vozilo.lokacija
     for field, value in updated_vozilo.model_dump().items():
         setattr(vozilo, field, value)
+    if vozilo.lokacija != old_lokacija:
+        vozilo.gradID = resolve_grad(db, vozilo.lokacija)
+    if vozilo.slike != old_slike:
+        # Flush the removals first so the new rows can reuse their positions
+        vozilo.slikeVozila.clear()
+        db.flush()
+        vozilo.slikeVozila = build_slike(parse_slike(vozilo.slike))
+    new_facets = facet_values(vozilo)
+    changed = [facet for facet in new_facets if new_facets[facet] != old_facets[facet]]
+    adjust_facets(db, {facet: old_facets[facet] for facet in changed}, -1)
+    adjust_facets(db, {facet: new_facets[facet] for facet in changed}, 1)
     db.commit()
+    invalidate("vozila", f"vozilo:{vozilo_id}")
     db.refresh(vozilo)
     return vozilo
 
@@ -254,8 +381,11 @@ def delete_vozilo(vozilo_id: int, db: Session = Depends(get_db)):
     vozilo = db.query(SQLAlchemyVozilo).filter(SQLAlchemyVozilo.voziloID == vozilo_id).first()
     if vozilo is None:
         raise HTTPException(status_code=404, detail="Vehicle not found")
+    if not vozilo.prodato:
+        adjust_facets(db, facet_values(vozilo), -1)
     db.delete(vozilo)
     db.commit()
+    invalidate("vozila", "oglasi", f"vozilo:{vozilo_id}")
     return {"message": "Vehicle deleted successfully"}
 
 @router.get("/vozila/{vozilo_id}/seller", response_model=User)
@@ -1,7 +1,11 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, BigInteger, Date, DECIMAL, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Computed, Index, UniqueConstraint, func, literal_column, text, Integer, String, Float, DateTime, ForeignKey, Boolean, BigInteger, Date, DECIMAL, Text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 from database import Base
 
+# Vehicles without a parsed mileage sort after every real value
+MAX_KM = 2147483647
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True)
@@ -16,6 +20,10 @@ class User(Base):
     updated_at = Column(DateTime)
     deleted_at = Column(DateTime)
 
+    __table_args__ = (
+        UniqueConstraint("email", name="uq_users_email"),
+    )
+
     # Relationships
     oglasi = relationship(
         "Oglas",
@@ -40,41 +48,127 @@ class Vozilo(Base):
     model = Column(String(255), nullable=False)
     godinaProizvodnje = Column(Integer, nullable=False)
     cena = Column(Float, nullable=False)  # Changed from DECIMAL to Float for compatibility
-    tipGoriva = Column(String(255), nullable=False)
+    tipGoriva = Column(String(255), nullable=False, index=True)
     kilometraza = Column(String(255), nullable=False)
-    tipKaroserije = Column(String(255), nullable=False)
+    kilometrazaKm = Column(Integer, index=True)
+    tipKaroserije = Column(String(255), nullable=False, index=True)
     snagaMotoraKW = Column(Float, nullable=False)
-    stanje = Column(String(255), nullable=False)
+    stanje = Column(String(255), nullable=False, index=True)
     opis = Column(Text, nullable=False)
     slike = Column(Text, nullable=False)  # JSON field
-    lokacija = Column(String(255), nullable=False)
+    lokacija = Column(String(255), nullable=False, index=True)
+    gradID = Column(Integer, ForeignKey("grad.gradID"), index=True)  # lokacija resolved to a known city
     klima = Column(String(255), nullable=False)
-    tipMenjaca = Column(String(255), nullable=False)
+    tipMenjaca = Column(String(255), nullable=False, index=True)
     ostecenje = Column(Boolean, nullable=False)
-    euroNorma = Column(String(255), nullable=False)
-    kubikaza = Column(Integer, nullable=False)
+    euroNorma = Column(String(255), nullable=False, index=True)
+    kubikaza = Column(Integer, nullable=False, index=True)
     deleted_at = Column(DateTime)
     created_at = Column(DateTime)
     updated_at = Column(DateTime)
+    # Full-text document kept up to date by Postgres on every insert/update
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('simple', marka || ' ' || model), 'A') || "
+        "setweight(to_tsvector('simple', lokacija), 'B') || "
+        "setweight(to_tsvector('simple', opis), 'C')",
+        persisted=True,
+    )))
+
+    # Denormalized from the ad status so "not sold" can be a partial-index predicate
+    prodato = Column(Boolean, nullable=False, default=False, server_default=text("false"))
+    # Row version bumped by the ORM on every update; ETags are derived from it
+    verzija = Column(Integer, nullable=False, server_default=text("1"))
+
+    __mapper_args__ = {"version_id_col": verzija}
+    __table_args__ = (
+        Index("ix_vozilo_search_vector", "search_vector", postgresql_using="gin"),
+        # One partial index per catalog sort mode, restricted to unsold vehicles
+        Index("ix_vozilo_unsold_newest", voziloID, postgresql_where=~prodato),
+        Index("ix_vozilo_unsold_cena", cena, voziloID, postgresql_where=~prodato),
+        Index("ix_vozilo_unsold_godina", godinaProizvodnje, voziloID, postgresql_where=~prodato),
+        Index(
+            "ix_vozilo_unsold_km",
+            func.coalesce(kilometrazaKm, literal_column(str(MAX_KM))),
+            voziloID,
+            postgresql_where=~prodato
+        ),
+        Index("ix_vozilo_unsold_snaga", snagaMotoraKW, voziloID, postgresql_where=~prodato),
+    )
 
     # Note: No direct relationship to users table in schema provided
     # Adding back reference for potential future use
     oglas = relationship("Oglas", back_populates="vozilo")
+    slikeVozila = relationship(
+        "VoziloSlika",
+        back_populates="vozilo",
+        order_by="VoziloSlika.pozicija",
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
+
+# Sort key of the km_asc catalog order; the literal is inlined so it matches the index expression
+KM_SORT_KEY = func.coalesce(Vozilo.kilometrazaKm, literal_column(str(MAX_KM)))
+
+class Grad(Base):
+    __tablename__ = "grad"
+    gradID = Column(Integer, primary_key=True, index=True)
+    naziv = Column(String(255), nullable=False)
+    kljuc = Column(String(255), nullable=False, unique=True)  # see lokacije.grad_kljuc
+    sirina = Column(Float, nullable=False)  # latitude
+    duzina = Column(Float, nullable=False)  # longitude
+    created_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_grad_sirina_duzina", "sirina", "duzina"),
+    )
+
+class VoziloSlika(Base):
+    __tablename__ = "vozilo_slika"
+    slikaID = Column(Integer, primary_key=True, index=True)
+    voziloID = Column(Integer, ForeignKey("vozilo.voziloID", ondelete="CASCADE"), nullable=False)
+    putanja = Column(String(255), nullable=False)
+    pozicija = Column(Integer, nullable=False)  # 0 is the cover image
+    sirina = Column(Integer)
+    visina = Column(Integer)
+    velicinaBajtova = Column(Integer)
+    hash = Column(String(64))  # SHA-256 of the file contents
+    created_at = Column(DateTime)
+
+    __table_args__ = (
+        UniqueConstraint("voziloID", "pozicija", name="uq_vozilo_slika_pozicija"),
+    )
+
+    vozilo = relationship("Vozilo", back_populates="slikeVozila")
 
 class Oglas(Base):
     __tablename__ = "oglas"
     oglasID = Column(Integer, primary_key=True, index=True)
     datumKreiranja = Column(Date, nullable=False)
-    datumIsteka = Column(Date, nullable=False)
+    datumIsteka = Column(Date, nullable=False, index=True)
     cenaIstaknutogOglasa = Column(Float)
     voziloID = Column(Integer, ForeignKey("vozilo.voziloID"), nullable=False)
-    korisnikID = Column(Integer, ForeignKey("users.id"), nullable=False)
-    buyerID = Column(Integer, ForeignKey("users.id"), nullable=True)
-    statusOglasa = Column(String(50), nullable=False, default='standardniOglas')
+    korisnikID = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    buyerID = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    statusOglasa = Column(String(50), nullable=False, default='standardniOglas', index=True)
     datumProdaje = Column(Date, nullable=True)
     created_at = Column(DateTime)
     updated_at = Column(DateTime)
     deleted_at = Column(DateTime)
+    # Row version bumped by the ORM on every update; ETags are derived from it
+    verzija = Column(Integer, nullable=False, server_default=text("1"))
+
+    __mapper_args__ = {"version_id_col": verzija}
+    __table_args__ = (
+        # One ad per vehicle; also serves every lookup by voziloID
+        UniqueConstraint("voziloID", name="uq_oglas_voziloID"),
+        Index(
+            "ix_oglas_active_istek",
+            datumIsteka,
+            statusOglasa,
+            postgresql_where=statusOglasa.in_(['standardniOglas', 'istaknutiOglas', 'aktivan'])
+        ),
+        Index("ix_oglas_unsold_korisnik", korisnikID, postgresql_where=statusOglasa != 'prodat'),
+    )
 
     # Relationships
     vozilo = relationship("Vozilo", back_populates="oglas")
@@ -91,15 +185,20 @@ class Oglas(Base):
 class Uplata(Base):
     __tablename__ = "uplata"
     uplataID = Column(Integer, primary_key=True, index=True)
-    fromUserID = Column(Integer, ForeignKey("users.id"))
+    fromUserID = Column(Integer, ForeignKey("users.id"), index=True)
     toUserID = Column(Integer, ForeignKey("users.id"))
     toOglasID = Column(Integer, ForeignKey("oglas.oglasID"))
-    datumUplate = Column(DateTime, nullable=False)
+    datumUplate = Column(DateTime, nullable=False, index=True)
     iznos = Column(DECIMAL(12, 2), nullable=False)
     tip = Column(String(20), nullable=False, default='wallet')
     created_at = Column(DateTime)
     updated_at = Column(DateTime)
 
+    __table_args__ = (
+        # Revenue and report queries filter on tip and a date range
+        Index("ix_uplata_tip_datumUplate", tip, datumUplate),
+    )
+
     # Relationships
     from_user = relationship("User", foreign_keys=[fromUserID], back_populates="uplate_from")
     to_user = relationship("User", foreign_keys=[toUserID], back_populates="uplate_to")
@@ -115,6 +214,11 @@ class Izvestaj(Base):
     updated_at = Column(DateTime)
     deleted_at = Column(DateTime)
 
+    __table_args__ = (
+        # One daily revenue rollup per day, see rollups.py
+        Index("uq_izvestaj_dan", datumOd, unique=True, postgresql_where=datumOd == datumDo),
+    )
+
     # Relationships
     izvestaj_oglas = relationship("IzvestajOglas", back_populates="izvestaj")
 
@@ -127,9 +231,21 @@ class IzvestajOglas(Base):
     tip = Column(String(20), nullable=False)
     datumUplate = Column(Date)
     iznos = Column(DECIMAL(12, 2))
+    brojUplata = Column(Integer)  # Payments summed into iznos on rollup lines
     deleted_at = Column(DateTime)
 
+    __table_args__ = (
+        # Rollup lines have no ad: one per daily report and payment type
+        Index("uq_izvestaj_oglas_dan_tip", izvestajID, tip, unique=True, postgresql_where=oglasID.is_(None)),
+    )
+
     # Relationships
     izvestaj = relationship("Izvestaj", back_populates="izvestaj_oglas")
     oglas = relationship("Oglas", back_populates="izvestaj_oglas")
     user = relationship("User", back_populates="izvestaj_oglas")
+
+class VoziloFacet(Base):
+    __tablename__ = "vozilo_facet"
+    facet = Column(String(50), primary_key=True)
+    vrednost = Column(String(255), primary_key=True)
+    brojVozila = Column(Integer, nullable=False, default=0)
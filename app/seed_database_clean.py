@@ -12,8 +12,12 @@ from sqlalchemy.orm import Session
 from pathlib import Path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from database import SessionLocal, engine, Base
+from database import SessionLocal, Base, ensure_database, get_engine
 from schemas import User, Vozilo, Oglas, Uplata, Izvestaj, IzvestajOglas
+from facets import rebuild_facets
+from images import backfill_slike
+from lokacije import backfill_gradovi
+from pydantic_models import parse_kilometraza
 from werkzeug.security import generate_password_hash
 
 def create_sample_users(db: Session):
@@ -249,7 +253,7 @@ def create_sample_vozila(db: Session):
             Vozilo.godinaProizvodnje == vozilo_data["godinaProizvodnje"]
         ).first()
         if not existing_vozilo:
-            vozilo = Vozilo(**vozilo_data)
+            vozilo = Vozilo(**vozilo_data, kilometrazaKm=parse_kilometraza(vozilo_data["kilometraza"]))
             db.add(vozilo)
 
     db.commit()
@@ -299,8 +303,9 @@ def seed_database():
     """Main seeding function"""
     print("Starting database seeding...")
 
-    # Create all tables
-    Base.metadata.create_all(bind=engine)
+    # Create the database if needed, then all tables
+    ensure_database()
+    Base.metadata.create_all(bind=get_engine())
     print("Database tables created/verified")
 
     # Create database session
@@ -311,6 +316,9 @@ def seed_database():
         create_sample_users(db)
         create_sample_vozila(db)
         create_sample_oglasi(db)
+        backfill_slike(db.connection())
+        backfill_gradovi(db.connection())
+        rebuild_facets(db)
 
         print("Database seeding completed successfully!")
 
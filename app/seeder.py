@@ -7,9 +7,12 @@ from typing import List
 
 from sqlalchemy.orm import Session
 
-from database import Base, engine, SessionLocal
+from database import Base, SessionLocal, ensure_database, get_engine
 from schemas import User as UserModel, Vozilo, Oglas
 from auth import get_password_hash
+from facets import rebuild_facets
+from images import backfill_slike
+from lokacije import backfill_gradovi
 
 FIRST_NAMES = [
     "Marko", "Jovan", "Nikola", "Ana", "Milica", "Petar", "Maja", "Stefan",
@@ -70,8 +73,9 @@ def ensure_sample_image() -> None:
 
 def reset_database() -> None:
     """Drop and recreate all tables."""
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
+    ensure_database()
+    Base.metadata.drop_all(bind=get_engine())
+    Base.metadata.create_all(bind=get_engine())
 
 
 def generate_phone_number() -> str:
@@ -107,6 +111,7 @@ def create_vehicle(session: Session, owner_id: int) -> Vozilo:
         cena=float(cena),
         tipGoriva=fuel,
         kilometraza=f"{kilometraza} km",
+        kilometrazaKm=kilometraza,
         tipKaroserije=body,
         snagaMotoraKW=float(snaga),
         stanje=stanje,
@@ -170,6 +175,9 @@ def seed_database(users_count: int = 50, vehicles_per_user: int = 15) -> None:
                 print(f"✔️ Kreirano {idx} korisnika ({idx * vehicles_per_user} vozila)")
 
         session.commit()
+        backfill_slike(session.connection())
+        backfill_gradovi(session.connection())
+        rebuild_facets(session)
         print(f"✅ Baza je popunjena sa {users_count} korisnika i {users_count * vehicles_per_user} vozila.")
     except Exception as exc:
         session.rollback()
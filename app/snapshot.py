@@ -0,0 +1,108 @@
+"""Precomputed homepage document.
+
+The snapshot is rebuilt by a background task every HOME_SNAPSHOT_INTERVAL
+seconds and shortly after any listing write in this worker, so serving it is
+a memory read. Writes made through other workers show up on the next
+interval.
+"""
+import asyncio
+import os
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from cache import on_invalidate
+from database import SessionLocal
+from etags import make_etag
+from facets import stored_total
+from filters import annotate_vozila, unsold_vozila_query
+from pydantic_models import HomeSnapshot
+from schemas import Oglas, Vozilo
+
+HOME_SNAPSHOT_INTERVAL = int(os.getenv("HOME_SNAPSHOT_INTERVAL", "60"))
+HOME_FEATURED_LIMIT = 8
+HOME_NEWEST_LIMIT = 12
+# Cache tags whose invalidation means the listings on the homepage changed
+LISTING_TAGS = {"vozila", "oglasi"}
+
+
+def build_snapshot(db: Session) -> HomeSnapshot:
+    query = unsold_vozila_query(db)
+    featured = query.filter(Oglas.statusOglasa == 'istaknutiOglas')
+    featured_rows = featured.order_by(Vozilo.voziloID.desc()).limit(HOME_FEATURED_LIMIT).all()
+    newest_rows = query.order_by(Vozilo.voziloID.desc()).limit(HOME_NEWEST_LIMIT).all()
+
+    return HomeSnapshot.model_validate({
+        "featured": annotate_vozila(db, featured_rows),
+        "newest": annotate_vozila(db, newest_rows),
+        "counts": {
+            "aktivnihVozila": stored_total(db),
+            "istaknutihOglasa": featured.order_by(None).count(),
+            "prodatihVozila": db.query(func.count(Vozilo.voziloID)).filter(Vozilo.prodato).scalar(),
+        },
+        "generatedAt": datetime.utcnow(),
+    }, from_attributes=True)
+
+
+class HomeSnapshotStore:
+    """Serialized snapshot plus the background task that keeps it fresh."""
+
+    def __init__(self, interval: int = HOME_SNAPSHOT_INTERVAL):
+        self.interval = interval
+        self._current: Optional[Tuple[bytes, str]] = None
+        self._stale: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def refresh(self) -> None:
+        db = SessionLocal()
+        try:
+            body = build_snapshot(db).model_dump_json().encode()
+        finally:
+            db.close()
+        self._current = (body, make_etag("home", body.decode()))
+
+    def current(self) -> Tuple[bytes, str]:
+        """Body and ETag of the latest snapshot, built on the spot before the first refresh."""
+        if self._current is None:
+            self.refresh()
+        return self._current
+
+    def mark_stale(self, tags) -> None:
+        """Schedule a rebuild; safe to call from the threadpool that runs sync endpoints."""
+        if self._loop is not None and LISTING_TAGS.intersection(tags):
+            self._loop.call_soon_threadsafe(self._stale.set)
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stale = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._loop = self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            # Writes arriving during a rebuild set the event again and trigger one more
+            self._stale.clear()
+            try:
+                await run_in_threadpool(self.refresh)
+            except Exception as e:
+                print(f"Error refreshing home snapshot: {str(e)}")
+            try:
+                await asyncio.wait_for(self._stale.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+home_snapshot = HomeSnapshotStore()
+on_invalidate(home_snapshot.mark_stale)
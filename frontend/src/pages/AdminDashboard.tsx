@@ -1,5 +1,5 @@
 import { useEffect, useMemo, useState } from 'react'
-import { adminApi, Payment, RevenueSummary, ReportSummary, User } from '@/services/api'
+import { adminApi, Payment, RevenueBucket, RevenueSeries, RevenueSummary, ReportSummary, User } from '@/services/api'
 import { Users, CreditCard, BarChart, Trash2, User as UserIcon, UserX } from 'lucide-react'
 
 interface PaymentFilters {
@@ -17,6 +17,8 @@ const AdminDashboard = () => {
   const [payments, setPayments] = useState<Payment[]>([])
   const [revenue, setRevenue] = useState<RevenueSummary | null>(null)
   const [reports, setReports] = useState<ReportSummary[]>([])
+  const [series, setSeries] = useState<RevenueSeries | null>(null)
+  const [bucket, setBucket] = useState<RevenueBucket>('day')
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState<string | null>(null)
   const [filters, setFilters] = useState<PaymentFilters>({ start_date: '', end_date: '', tip: '' })
@@ -27,7 +29,7 @@ const AdminDashboard = () => {
       setLoading(true)
       setError(null)
 
-      const [usersData, paymentsData, revenueData, reportsData] = await Promise.all([
+      const [usersData, paymentsData, revenueData, reportsData, seriesData] = await Promise.all([
         adminApi.listUsers(0, 100, userFilters.showDeleted),
         adminApi.listPayments({
           start_date: filters.start_date || undefined,
@@ -42,6 +44,11 @@ const AdminDashboard = () => {
           start_date: filters.start_date || undefined,
           end_date: filters.end_date || undefined,
           tip: filters.tip || undefined
+        }),
+        adminApi.revenueSeries({
+          bucket,
+          start_date: filters.start_date || undefined,
+          end_date: filters.end_date || undefined
         })
       ])
 
@@ -49,6 +56,7 @@ const AdminDashboard = () => {
       setPayments(paymentsData)
       setRevenue(revenueData)
       setReports(reportsData)
+      setSeries(seriesData)
     } catch (err) {
       console.error('Error loading admin data:', err)
       setError(err instanceof Error ? err.message : 'Došlo je do greške prilikom učitavanja podataka.')
@@ -62,6 +70,20 @@ const AdminDashboard = () => {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [])
 
+  const handleBucketChange = async (value: RevenueBucket) => {
+    setBucket(value)
+    try {
+      setSeries(await adminApi.revenueSeries({
+        bucket: value,
+        start_date: filters.start_date || undefined,
+        end_date: filters.end_date || undefined
+      }))
+    } catch (err) {
+      console.error('Error loading revenue series:', err)
+      setError(err instanceof Error ? err.message : 'Došlo je do greške prilikom učitavanja podataka.')
+    }
+  }
+
   const handleFilterSubmit = async (e: React.FormEvent) => {
     e.preventDefault()
     await fetchAll()
@@ -255,6 +277,51 @@ const AdminDashboard = () => {
           </div>
         </section>
 
+        <section className="bg-white rounded-lg shadow overflow-hidden">
+          <div className="px-6 py-4 border-b border-gray-200 flex items-center justify-between">
+            <h2 className="text-lg font-semibold text-gray-900">Prihod po periodu</h2>
+            <select
+              value={bucket}
+              onChange={(e) => handleBucketChange(e.target.value as RevenueBucket)}
+              className="border border-gray-300 rounded-md px-3 py-2 text-sm"
+            >
+              <option value="day">Po danu</option>
+              <option value="week">Po nedelji</option>
+              <option value="month">Po mesecu</option>
+            </select>
+          </div>
+          <div className="overflow-x-auto max-h-96">
+            <table className="min-w-full divide-y divide-gray-200">
+              <thead className="bg-gray-50">
+                <tr>
+                  <th className="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Period od</th>
+                  <th className="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Istaknuti oglasi</th>
+                  <th className="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Prihod</th>
+                  <th className="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Kupovine</th>
+                  <th className="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Promet</th>
+                </tr>
+              </thead>
+              <tbody className="bg-white divide-y divide-gray-200">
+                {series?.points.map((point) => (
+                  <tr key={point.bucket}>
+                    <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-700">
+                      {new Date(point.bucket).toLocaleDateString('sr-RS')}
+                    </td>
+                    <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-900">{point.featured_count}</td>
+                    <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-900">
+                      {point.featured_revenue.toLocaleString('sr-RS', { style: 'currency', currency: 'EUR' })}
+                    </td>
+                    <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-900">{point.purchase_count}</td>
+                    <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-900">
+                      {point.purchase_volume.toLocaleString('sr-RS', { style: 'currency', currency: 'EUR' })}
+                    </td>
+                  </tr>
+                ))}
+              </tbody>
+            </table>
+          </div>
+        </section>
+
         <section className="bg-white rounded-lg shadow overflow-hidden">
           <div className="px-6 py-4 border-b border-gray-200 flex items-center justify-between">
             <h2 className="text-lg font-semibold text-gray-900">Korisnici</h2>
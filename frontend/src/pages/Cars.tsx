@@ -1,11 +1,10 @@
-import { useState, useEffect, useMemo } from 'react';
+import { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { MapPin, Fuel } from 'lucide-react';
-import { carApi, Car } from '@/services/api';
+import { carApi, Car, CarSort } from '@/services/api';
 import { useAuth } from '@/AuthContext';
 import { FeaturedBadge } from '@/components/FeaturedAd/FeaturedBadge';
 import {
-  CAR_BRANDS,
   BRAND_OPTIONS,
   BODY_TYPE_OPTIONS,
   TRANSMISSION_OPTIONS,
@@ -38,152 +37,135 @@ const createDefaultFilters = () => ({
   maxKilometraza: '',
 });
 
+const SORT_OPTIONS: { label: string; value: CarSort }[] = [
+  { label: 'Najnovije', value: 'newest' },
+  { label: 'Cena: od najniže', value: 'price_asc' },
+  { label: 'Cena: od najviše', value: 'price_desc' },
+  { label: 'Godište: od najnovijeg', value: 'year_desc' },
+  { label: 'Kilometraža: od najmanje', value: 'km_asc' },
+  { label: 'Snaga: od najveće', value: 'power_desc' },
+];
+
+type Filters = ReturnType<typeof createDefaultFilters>;
+
+const toNumber = (value: string): number | undefined => {
+  if (!value) return undefined;
+  const parsed = Number(value);
+  return Number.isNaN(parsed) ? undefined : parsed;
+};
+
+// Map the sidebar filters to the /vozila/search/ query parameters
+const toSearchParams = (filters: Filters, sort: CarSort) => ({
+  marka: filters.marka,
+  model: filters.model,
+  lokacija: filters.lokacija.trim(),
+  tipGoriva: filters.tipGoriva,
+  stanje: filters.stanje,
+  tipKaroserije: filters.tipKaroserije,
+  tipMenjaca: filters.tipMenjaca,
+  euroNorma: filters.euroNorma,
+  klima: filters.klima ? filters.klima === 'ima' : undefined,
+  ostecenje: filters.ostecenje ? filters.ostecenje === 'true' : undefined,
+  min_cena: toNumber(filters.minPrice),
+  max_cena: toNumber(filters.maxPrice),
+  min_godina: toNumber(filters.godinaOd),
+  max_godina: toNumber(filters.godinaDo),
+  min_kubikaza: toNumber(filters.minKubikaza),
+  max_kubikaza: toNumber(filters.maxKubikaza),
+  min_snaga: toNumber(filters.minSnaga),
+  max_snaga: toNumber(filters.maxSnaga),
+  min_km: toNumber(filters.minKilometraza),
+  // 0 in "Kilometraža do" means no upper bound
+  max_km: toNumber(filters.maxKilometraza) || undefined,
+  sort,
+  pin_featured: true,
+});
+
+type SearchParams = ReturnType<typeof toSearchParams>;
+
 const Cars = () => {
   const [cars, setCars] = useState<Car[]>([]);
-  const [filteredCars, setFilteredCars] = useState<Car[]>([]);
+  const [total, setTotal] = useState<number | null>(null);
+  const [totalEstimated, setTotalEstimated] = useState(false);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
   const [filters, setFilters] = useState(createDefaultFilters);
-  const [currentPage, setCurrentPage] = useState(1);
+  const [sort, setSort] = useState<CarSort>('newest');
+  const [availableModels, setAvailableModels] = useState<string[]>([]);
+  // The cursor of every page up to the current one; the first page has none
+  const [search, setSearch] = useState<{ params: SearchParams; cursors: (string | undefined)[] }>(() => ({
+    params: toSearchParams(createDefaultFilters(), 'newest'),
+    cursors: [undefined],
+  }));
   const pageSize = 50;
+  const currentPage = search.cursors.length;
   
   const navigate = useNavigate();
   const { user } = useAuth();
-  // Fetch cars from API
+
+  // Start over from the first page once the filters stop changing
+  useEffect(() => {
+    const timeout = setTimeout(() => {
+      const params = toSearchParams(filters, sort);
+      setSearch((prev) =>
+        JSON.stringify(prev.params) === JSON.stringify(params) ? prev : { params, cursors: [undefined] }
+      );
+    }, 300);
+    return () => clearTimeout(timeout);
+  }, [filters, sort]);
+
+  // Fetch the current page from the API
   useEffect(() => {
+    let cancelled = false;
+    const cursor = search.cursors[search.cursors.length - 1];
+
     const fetchCars = async () => {
       try {
         setLoading(true);
-        const carsData = await carApi.getAll(0, 1000);
-
-        // Sort cars: featured first (based on istaknuto/isFeatured), then by creation date (newest first)
-        const sortedCars = [...carsData].sort((a, b) => {
-          const aFeatured = Boolean(a.isFeatured ?? a.istaknuto ?? false);
-          const bFeatured = Boolean(b.isFeatured ?? b.istaknuto ?? false);
-          
-          if (aFeatured && !bFeatured) return -1;
-          if (!aFeatured && bFeatured) return 1;
-          
-          // Then by creation date (newest first)
-          const dateA = a.created_at ? new Date(a.created_at).getTime() : 0;
-          const dateB = b.created_at ? new Date(b.created_at).getTime() : 0;
-          return dateB - dateA;
-        });
-
-        setCars(sortedCars);
-        setFilteredCars(sortedCars);
+        const page = await carApi.search({ ...search.params, cursor, limit: pageSize, total: !cursor });
+        if (cancelled) return;
+        setCars(page.cars);
+        setNextCursor(page.nextCursor);
+        if (!cursor) {
+          setTotal(page.total);
+          setTotalEstimated(page.totalEstimated);
+        }
       } catch (error) {
         console.error('Error fetching cars:', error);
+        if (cancelled) return;
         // Fallback to empty array on error
         setCars([]);
-        setFilteredCars([]);
+        setNextCursor(null);
+        setTotal(0);
+        setTotalEstimated(false);
       } finally {
-        setLoading(false);
+        if (!cancelled) setLoading(false);
       }
     };
 
     fetchCars();
-  }, []);
-
-  const availableModels = useMemo(() => {
-    if (filters.marka) {
-      const modelsFromConst = CAR_BRANDS[filters.marka];
-      if (modelsFromConst?.length) {
-        return modelsFromConst;
-      }
-      return Array.from(
-        new Set(cars.filter((car) => car.marka.toLowerCase() === filters.marka.toLowerCase()).map((car) => car.model))
-      ).sort();
-    }
-
-    return Array.from(new Set(cars.map((car) => car.model))).sort();
-  }, [filters.marka, cars]);
-
-  const filterCars = () => {
-    const toNumber = (value: string): number | undefined => {
-      if (!value) return undefined;
-      const parsed = Number(value);
-      return Number.isNaN(parsed) ? undefined : parsed;
+    return () => {
+      cancelled = true;
     };
+  }, [search]);
 
-    const parseKilometraza = (value: string | number | null | undefined): number => {
-      if (value === null || value === undefined) return 0
-      const str = value.toString().replace(/[^0-9]/g, '')
-      return str ? Number(str) : 0
-    }
-
-    return cars.filter(car => {
-      const matchesMarka = !filters.marka || car.marka.toLowerCase().includes(filters.marka.toLowerCase());
-      const matchesModel = !filters.model || (car.model || '').toLowerCase().includes(filters.model.toLowerCase());
-      const minPrice = toNumber(filters.minPrice);
-      const maxPrice = toNumber(filters.maxPrice);
-      const matchesMinPrice = minPrice === undefined || car.cena >= minPrice;
-      const matchesMaxPrice = maxPrice === undefined || car.cena <= maxPrice;
-      const minYear = toNumber(filters.godinaOd);
-      const maxYear = toNumber(filters.godinaDo);
-      const matchesYearFrom = minYear === undefined || car.godinaProizvodnje >= minYear;
-      const matchesYearTo = maxYear === undefined || car.godinaProizvodnje <= maxYear;
-      const matchesTipGoriva = !filters.tipGoriva || car.tipGoriva.toLowerCase() === filters.tipGoriva.toLowerCase();
-      const matchesLokacija = !filters.lokacija || car.lokacija.toLowerCase().includes(filters.lokacija.toLowerCase());
-      const matchesStanje = !filters.stanje || car.stanje.toLowerCase() === filters.stanje.toLowerCase();
-      const matchesKaroserija = !filters.tipKaroserije || car.tipKaroserije.toLowerCase() === filters.tipKaroserije.toLowerCase();
-      const matchesMenjac = !filters.tipMenjaca || car.tipMenjaca.toLowerCase() === filters.tipMenjaca.toLowerCase();
-      const matchesKlima = !filters.klima ||
-        (filters.klima === 'ima'
-          ? !/bez/i.test(car.klima)
-          : /bez/i.test(car.klima));
-      const matchesEuro = !filters.euroNorma || car.euroNorma.toLowerCase() === filters.euroNorma.toLowerCase();
-
-      const minKubikaza = toNumber(filters.minKubikaza);
-      const maxKubikaza = toNumber(filters.maxKubikaza);
-      const matchesMinKubikaza = minKubikaza === undefined || car.kubikaza >= minKubikaza;
-      const matchesMaxKubikaza = maxKubikaza === undefined || car.kubikaza <= maxKubikaza;
-
-      const minSnaga = toNumber(filters.minSnaga);
-      const maxSnaga = toNumber(filters.maxSnaga);
-      const matchesMinSnaga = minSnaga === undefined || car.snagaMotoraKW >= minSnaga;
-      const matchesMaxSnaga = maxSnaga === undefined || car.snagaMotoraKW <= maxSnaga;
-
-      const carKilometraza = parseKilometraza(car.kilometraza);
-      const minKilometraza = toNumber(filters.minKilometraza);
-      const maxKilometraza = toNumber(filters.maxKilometraza);
-      const matchesMinKilometraza = minKilometraza === undefined || carKilometraza >= minKilometraza;
-      const matchesMaxKilometraza = maxKilometraza === undefined || (maxKilometraza === 0 ? true : carKilometraza <= maxKilometraza);
-
-      const matchesOstecenje = !filters.ostecenje ||
-        (filters.ostecenje === 'true' ? car.ostecenje : !car.ostecenje);
-
-      return matchesMarka &&
-        matchesModel &&
-        matchesMinPrice &&
-        matchesMaxPrice &&
-        matchesYearFrom &&
-        matchesYearTo &&
-        matchesTipGoriva &&
-        matchesLokacija &&
-        matchesStanje &&
-        matchesKaroserija &&
-        matchesMenjac &&
-        matchesKlima &&
-        matchesEuro &&
-        matchesMinKubikaza &&
-        matchesMaxKubikaza &&
-        matchesMinSnaga &&
-        matchesMaxSnaga &&
-        matchesMinKilometraza &&
-        matchesMaxKilometraza &&
-        matchesOstecenje;
-    });
-  };
-
+  // Models that have listings, for the selected brand if there is one
   useEffect(() => {
-    setFilteredCars(filterCars())
-    setCurrentPage(1)
-  }, [cars, filters])
-
-  const paginatedCars = useMemo(() => {
-    const start = (currentPage - 1) * pageSize
-    return filteredCars.slice(start, start + pageSize)
-  }, [filteredCars, currentPage])
+    let cancelled = false;
+
+    carApi.getFacets({ marka: filters.marka })
+      .then((facets) => {
+        if (!cancelled) setAvailableModels((facets.model ?? []).map((facet) => facet.value).sort());
+      })
+      .catch((error) => {
+        console.error('Error fetching models:', error);
+        if (!cancelled) setAvailableModels([]);
+      });
+
+    return () => {
+      cancelled = true;
+    };
+  }, [filters.marka]);
 
   const formatPrice = (price: number) => {
     return new Intl.NumberFormat('sr-RS', {
@@ -205,8 +187,14 @@ const Cars = () => {
     }))
   }
 
-  const handlePageChange = (nextPage: number) => {
-    setCurrentPage(nextPage)
+  const goToPreviousPage = () => {
+    setSearch((prev) => ({ ...prev, cursors: prev.cursors.slice(0, -1) }))
+    window.scrollTo({ top: 0, behavior: 'smooth' })
+  }
+
+  const goToNextPage = () => {
+    if (!nextCursor) return
+    setSearch((prev) => ({ ...prev, cursors: [...prev.cursors, nextCursor] }))
     window.scrollTo({ top: 0, behavior: 'smooth' })
   }
 
@@ -517,9 +505,24 @@ const Cars = () => {
           {/* Main Content */}
           <div className="flex-1">
             <div className="mb-6">
-              <p className="text-gray-600">
-                Pronađeno {filteredCars.length} vozila
-              </p>
+              <div className="flex flex-col sm:flex-row sm:items-center sm:justify-between gap-3">
+                <p className="text-gray-600">
+                  {total === null ? 'Pronađena vozila' : `Pronađeno ${totalEstimated ? 'oko ' : ''}${total} vozila`}
+                </p>
+                <div className="flex items-center gap-2">
+                  <label htmlFor="sort" className="text-sm font-medium text-gray-700">Sortiraj</label>
+                  <select
+                    id="sort"
+                    className="block rounded-md border-gray-300 shadow-sm focus:border-indigo-500 focus:ring-indigo-500 sm:text-sm"
+                    value={sort}
+                    onChange={(e) => setSort(e.target.value as CarSort)}
+                  >
+                    {SORT_OPTIONS.map((option) => (
+                      <option key={option.value} value={option.value}>{option.label}</option>
+                    ))}
+                  </select>
+                </div>
+              </div>
             </div>
 
             {/* Cars Grid */}
@@ -527,9 +530,9 @@ const Cars = () => {
               <div className="flex justify-center items-center py-12">
                 <div className="animate-spin rounded-full h-12 w-12 border-b-2 border-indigo-600"></div>
               </div>
-            ) : filteredCars.length > 0 ? (
+            ) : cars.length > 0 ? (
               <div className="grid grid-cols-1 gap-6 sm:grid-cols-2 lg:grid-cols-2 xl:grid-cols-3">
-                {paginatedCars.map((car) => {
+                {cars.map((car) => {
                   const toImageUrl = (raw: string): string => {
                     if (!raw) return '';
                     let p = String(raw)
@@ -664,21 +667,21 @@ const Cars = () => {
               </div>
             )}
 
-            {filteredCars.length > pageSize && (
+            {(currentPage > 1 || nextCursor) && (
               <div className="mt-6 flex items-center justify-center gap-3">
                 <button
-                  onClick={() => handlePageChange(Math.max(1, currentPage - 1))}
-                  disabled={currentPage === 1}
+                  onClick={goToPreviousPage}
+                  disabled={currentPage === 1 || loading}
                   className="px-3 py-1 text-sm border rounded-md bg-white text-gray-700 hover:bg-gray-100 disabled:opacity-50 disabled:cursor-not-allowed"
                 >
                   Prethodna
                 </button>
                 <span className="text-sm text-gray-600">
-                  Strana {currentPage} / {Math.ceil(filteredCars.length / pageSize)}
+                  Strana {currentPage}{total !== null && ` / ${Math.max(1, Math.ceil(total / pageSize))}`}
                 </span>
                 <button
-                  onClick={() => handlePageChange(currentPage * pageSize < filteredCars.length ? currentPage + 1 : currentPage)}
-                  disabled={currentPage * pageSize >= filteredCars.length}
+                  onClick={goToNextPage}
+                  disabled={!nextCursor || loading}
                   className="px-3 py-1 text-sm border rounded-md bg-white text-gray-700 hover:bg-gray-100 disabled:opacity-50 disabled:cursor-not-allowed"
                 >
                   Sledeća
@@ -8,8 +8,10 @@ export interface Car {
   cena: number
   tipGoriva: string
   kilometraza: string
+  kilometrazaKm?: number | null
   lokacija: string
   slike: string | string[] | null
+  naslovnaSlika?: string | null
   stanje: string
   kubikaza: number
   opis: string
@@ -39,6 +41,25 @@ const buildAuthHeaders = (): HeadersInit => {
   }
 }
 
+// Follow X-Next-Cursor until the last page of a keyset-paginated list
+const fetchAllPages = async <T>(url: URL, errorMessage: string): Promise<T[]> => {
+  const items: T[] = []
+  url.searchParams.set('limit', '500')
+  for (;;) {
+    const response = await fetch(url.toString(), {
+      headers: buildAuthHeaders()
+    })
+    if (!response.ok) {
+      const errorData = await response.json().catch(() => ({}))
+      throw new Error(errorData.detail || errorMessage)
+    }
+    items.push(...(await response.json()))
+    const cursor = response.headers.get('X-Next-Cursor')
+    if (!cursor) return items
+    url.searchParams.set('cursor', cursor)
+  }
+}
+
 export const adminApi = {
   listUsers: async (skip = 0, limit = 100): Promise<User[]> => {
     const response = await fetch(`${API_BASE_URL}/admin/users?skip=${skip}&limit=${limit}`, {
@@ -57,18 +78,27 @@ export const adminApi = {
       if (value) url.searchParams.append(key, value)
     })
 
+    return fetchAllPages<Payment>(url, 'Neuspešno učitavanje uplata')
+  },
+
+  revenueSummary: async (params: { start_date?: string; end_date?: string } = {}): Promise<RevenueSummary> => {
+    const url = new URL(`${API_BASE_URL}/admin/revenue`)
+    Object.entries(params).forEach(([key, value]) => {
+      if (value) url.searchParams.append(key, value)
+    })
+
     const response = await fetch(url.toString(), {
       headers: buildAuthHeaders()
     })
     if (!response.ok) {
       const errorData = await response.json().catch(() => ({}))
-      throw new Error(errorData.detail || 'Neuspešno učitavanje uplata')
+      throw new Error(errorData.detail || 'Neuspešno učitavanje prihoda')
     }
     return response.json()
   },
 
-  revenueSummary: async (params: { start_date?: string; end_date?: string } = {}): Promise<RevenueSummary> => {
-    const url = new URL(`${API_BASE_URL}/admin/revenue`)
+  revenueSeries: async (params: { bucket?: RevenueBucket; start_date?: string; end_date?: string } = {}): Promise<RevenueSeries> => {
+    const url = new URL(`${API_BASE_URL}/admin/revenue/series`)
     Object.entries(params).forEach(([key, value]) => {
       if (value) url.searchParams.append(key, value)
     })
@@ -78,7 +108,7 @@ export const adminApi = {
     })
     if (!response.ok) {
       const errorData = await response.json().catch(() => ({}))
-      throw new Error(errorData.detail || 'Neuspešno učitavanje prihoda')
+      throw new Error(errorData.detail || 'Neuspešno učitavanje prihoda po periodu')
     }
     return response.json()
   },
@@ -107,16 +137,7 @@ export const paymentApi = {
       if (value) url.searchParams.append(key, value)
     })
 
-    const response = await fetch(url.toString(), {
-      headers: buildAuthHeaders()
-    })
-
-    if (!response.ok) {
-      const errorData = await response.json().catch(() => ({}))
-      throw new Error(errorData.detail || 'Neuspešno učitavanje uplata korisnika')
-    }
-
-    return response.json()
+    return fetchAllPages<Payment>(url, 'Neuspešno učitavanje uplata korisnika')
   }
 }
 
@@ -156,6 +177,23 @@ export interface RevenueSummary {
   total_purchase_count: number
 }
 
+export type RevenueBucket = 'day' | 'week' | 'month'
+
+export interface RevenuePoint {
+  bucket: string
+  featured_revenue: number
+  featured_count: number
+  purchase_volume: number
+  purchase_count: number
+}
+
+export interface RevenueSeries {
+  bucket: RevenueBucket
+  start_date: string
+  end_date: string
+  points: RevenuePoint[]
+}
+
 export interface ReportSummary {
   tip: string
   total_count: number
@@ -188,6 +226,21 @@ export interface Oglas {
   deleted_at?: string
 }
 
+export type CarSort = 'newest' | 'price_asc' | 'price_desc' | 'year_desc' | 'km_asc' | 'power_desc'
+
+export interface FacetValue {
+  value: string
+  count: number
+}
+
+// One page of search results; nextCursor is null on the last page
+export interface CarPage {
+  cars: Car[]
+  nextCursor: string | null
+  total: number | null
+  totalEstimated: boolean
+}
+
 // API functions for Cars
 export const carApi = {
   // Get all cars
@@ -219,21 +272,63 @@ export const carApi = {
 
   // Search cars
   search: async (params: {
+    q?: string
     marka?: string
     model?: string
+    tipGoriva?: string | string[]
+    tipKaroserije?: string | string[]
+    tipMenjaca?: string | string[]
+    euroNorma?: string | string[]
+    lokacija?: string | string[]
+    stanje?: string | string[]
+    ostecenje?: boolean
+    klima?: boolean
     min_cena?: number
     max_cena?: number
-  }): Promise<Car[]> => {
+    min_godina?: number
+    max_godina?: number
+    min_snaga?: number
+    max_snaga?: number
+    min_kubikaza?: number
+    max_kubikaza?: number
+    min_km?: number
+    max_km?: number
+    sort?: CarSort
+    pin_featured?: boolean
+    total?: boolean
+    skip?: number
+    limit?: number
+    cursor?: string
+  }): Promise<CarPage> => {
     const searchParams = new URLSearchParams()
-    if (params.marka) searchParams.append('marka', params.marka)
-    if (params.model) searchParams.append('model', params.model)
-    if (params.min_cena) searchParams.append('min_cena', params.min_cena.toString())
-    if (params.max_cena) searchParams.append('max_cena', params.max_cena.toString())
+    Object.entries(params).forEach(([key, value]) => {
+      if (value === undefined || value === null || value === '') return
+      const values = Array.isArray(value) ? value : [value]
+      values.forEach((item) => searchParams.append(key, String(item)))
+    })
 
     const response = await fetch(`${API_BASE_URL}/vozila/search/?${searchParams}`)
     if (!response.ok) {
       throw new Error('Failed to search cars')
     }
+    const total = response.headers.get('X-Total-Count')
+    return {
+      cars: await response.json(),
+      nextCursor: response.headers.get('X-Next-Cursor'),
+      total: total === null ? null : Number(total),
+      totalEstimated: response.headers.get('X-Total-Count-Estimated') === 'true',
+    }
+  },
+
+  // Per-value counts of the catalog facets under the given filters
+  getFacets: async (params: { marka?: string } = {}): Promise<Record<string, FacetValue[]>> => {
+    const searchParams = new URLSearchParams()
+    if (params.marka) searchParams.append('marka', params.marka)
+
+    const response = await fetch(`${API_BASE_URL}/vozila/facets?${searchParams}`)
+    if (!response.ok) {
+      throw new Error('Failed to fetch facets')
+    }
     return response.json()
   },
 
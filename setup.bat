@@ -18,6 +18,7 @@ echo.
 echo 🗄️  Setting up database tables...
 cd app
 python database.py
+python -m migrations upgrade
 cd ..
 
 echo.
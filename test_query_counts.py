@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""N+1 guard for the "my ads" endpoints.
+
+Calls /oglasi/my/active and /oglasi/my/sold for a throwaway user with a
+growing number of ads and fails if the number of SQL statements grows with
+them. Runs against DATABASE_URL, like the other test scripts, and removes
+the rows it creates. Run it with pytest or directly.
+"""
+import os
+import sys
+import uuid
+from datetime import date, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+
+from fastapi.testclient import TestClient
+
+import main
+from auth import detached_user, get_current_user
+from database import SessionLocal
+from querycount import count_queries
+from schemas import Oglas, User, Vozilo
+
+AD_COUNTS = (1, 3, 10)
+
+
+def add_ads(db, user_id, count, status):
+    for _ in range(count):
+        vozilo = Vozilo(
+            marka="Test", model="N+1", godinaProizvodnje=2015, cena=1000, kilometraza="100000",
+            tipGoriva="Dizel", lokacija="Beograd", tipKaroserije="Hečbek", snagaMotoraKW=77,
+            stanje="Polovno", opis="query count test", slike="[]", klima="Manuelna klima",
+            tipMenjaca="Manuelni", ostecenje=False, euroNorma="Euro 5", kubikaza=1598,
+        )
+        db.add(vozilo)
+        db.flush()
+        db.add(Oglas(
+            voziloID=vozilo.voziloID, korisnikID=user_id, statusOglasa=status,
+            datumKreiranja=date.today(), datumIsteka=date.today() + timedelta(days=30),
+        ))
+    db.commit()
+
+
+def statement_counts(path, status):
+    """Statements run by ``path`` after each step of AD_COUNTS ads with ``status``."""
+    db = SessionLocal()
+    user = User(
+        korisnickoIme=f"querycount-{uuid.uuid4().hex[:8]}", email=f"querycount-{uuid.uuid4().hex[:8]}@test.local",
+        lozinka="-", tipKorisnika="Kupac",
+    )
+    db.add(user)
+    db.commit()
+    # A copy outside the session, so the endpoint does not reload it
+    current_user = detached_user(user)
+    main.app.dependency_overrides[get_current_user] = lambda: current_user
+    client = TestClient(main.app)
+    counts = {}
+    try:
+        added = 0
+        for count in AD_COUNTS:
+            add_ads(db, current_user.id, count - added, status)
+            added = count
+            with count_queries() as counter:
+                response = client.get(path)
+            assert response.status_code == 200, response.text
+            assert len(response.json()) == count
+            counts[count] = counter.count
+    finally:
+        main.app.dependency_overrides.pop(get_current_user, None)
+        vozilo_ids = [oglas.voziloID for oglas in db.query(Oglas).filter(Oglas.korisnikID == current_user.id)]
+        db.query(Oglas).filter(Oglas.korisnikID == current_user.id).delete(synchronize_session=False)
+        db.query(Vozilo).filter(Vozilo.voziloID.in_(vozilo_ids)).delete(synchronize_session=False)
+        db.query(User).filter(User.id == current_user.id).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+    return counts
+
+
+def assert_constant(path, status):
+    counts = statement_counts(path, status)
+    print(f"{path}: statements by number of ads {counts}")
+    assert len(set(counts.values())) == 1, f"{path} runs more statements as ads are added: {counts}"
+
+
+def test_my_active_ads_query_count():
+    assert_constant("/oglasi/my/active", "standardniOglas")
+
+
+def test_my_sold_ads_query_count():
+    assert_constant("/oglasi/my/sold", "prodat")
+
+
+if __name__ == "__main__":
+    test_my_active_ads_query_count()
+    test_my_sold_ads_query_count()
+    print("Query counts are constant")